@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_environment():
+    """Кеши во временных файлах, как у manage.py test (core.runner)."""
+    from core.runner import isolated_environment
+
+    with isolated_environment():
+        yield
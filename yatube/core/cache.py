@@ -0,0 +1,440 @@
+"""Бэкенды кеша, общие для всех процессов сервера.
+
+LocMemCache у каждого воркера свой: фрагмент ленты считается в каждом
+процессе заново, а cache.clear() чистит только один из них.
+
+SQLiteCache хранит записи в файле SQLite в режиме WAL на том же хосте.
+Размер ограничен по числу записей (MAX_ENTRIES) и по байтам
+(MAX_SIZE), при переполнении вытесняются давно не читанные записи.
+Счётчики записей и байт ведут триггеры, поэтому проверка лимитов не
+сканирует таблицу.
+
+RedisCache ходит на сервер с протоколом Redis через core.resp и
+подходит, когда воркеры живут на разных хостах.
+
+TieredCache ставит перед общим кешем небольшой LRU процесса (L1) с
+коротким сроком жизни: горячие ключи не читаются и не распаковываются
+из общего кеша на каждом запросе.
+"""
+import pickle
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+from .lru import MISSING, LRUCache
+from .resp import Client
+from .sqlite import LocalConnection
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + NEW.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - OLD.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache
+BEGIN
+    UPDATE cache_stats SET size = size - OLD.size + NEW.size;
+END;
+'''
+
+UPSERT = (
+    'INSERT INTO cache (key, value, expires, accessed, size)'
+    ' VALUES (?, ?, ?, ?, ?)'
+    ' ON CONFLICT (key) DO UPDATE SET value = excluded.value,'
+    ' expires = excluded.expires, accessed = excluded.accessed,'
+    ' size = excluded.size'
+)
+
+
+def _alive(expires, now):
+    return expires is None or expires > now
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self._max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        # Время последнего чтения обновляется не чаще раза в столько
+        # секунд: иначе каждое чтение было бы записью в файл.
+        self._access_resolution = options.get('ACCESS_RESOLUTION', 60)
+        self._connection = LocalConnection(
+            lambda: self.location,
+            timeout=options.get('LOCK_TIMEOUT', 5),
+            setup=lambda connection: connection.executescript(SCHEMA),
+        )
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection.get()
+        # IMMEDIATE сразу берёт блокировку записи: чтение и запись
+        # внутри транзакции видят одно и то же состояние.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        connection = self._connection.get()
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        now = time.time()
+        if row is None or not _alive(row[1], now):
+            return default
+        if now - row[2] > self._access_resolution:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key)
+            )
+        return pickle.loads(row[0])
+
+    def _set(self, key, value, timeout, only_new=False):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with self._write() as connection:
+            if only_new:
+                row = connection.execute(
+                    'SELECT expires FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and _alive(row[0], now):
+                    return False
+            connection.execute(
+                UPSERT, (key, data, expires, now, len(data))
+            )
+            self._cull(connection, now)
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(self._key(key, version), value, timeout, True)
+
+    def _over_limit(self, connection):
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        over = entries > self._max_entries or size > self._max_size
+        return over and entries > 0, entries
+
+    def _cull(self, connection, now):
+        over, entries = self._over_limit(connection)
+        if not over:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            (now,),
+        )
+        over, entries = self._over_limit(connection)
+        while over:
+            # Как у встроенных бэкендов: за раз уходит 1/CULL_FREQUENCY.
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                ' SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(entries // self._cull_frequency, 1),),
+            )
+            over, entries = self._over_limit(connection)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?'
+                ' AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, now),
+            )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection.get().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and _alive(row[0], time.time())
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        full_key = self._key(key, version)
+        with self._write() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (full_key,)
+            ).fetchone()
+            if row is None or not _alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, len(data), full_key),
+            )
+        return value
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+
+# INCRBY только существующего ключа одной командой: между отдельными
+# EXISTS и INCRBY ключ мог истечь, и INCRBY создал бы его заново.
+INCR_EXISTING = (
+    "if redis.call('EXISTS', KEYS[1]) == 1 then "
+    "return redis.call('INCRBY', KEYS[1], ARGV[1]) end "
+    "return false"
+)
+
+
+class RedisCache(BaseCache):
+    """Кеш на сервере с протоколом Redis: LOCATION = redis://host:port/db."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        url = urlparse(location)
+        options = params.get('OPTIONS', {})
+        self.client = Client(
+            host=url.hostname or '127.0.0.1',
+            port=url.port or 6379,
+            db=int(url.path.strip('/') or 0),
+            timeout=options.get('SOCKET_TIMEOUT', 1.0),
+        )
+
+    @staticmethod
+    def _dump(value):
+        # Целые числа хранятся текстом, чтобы работал INCRBY.
+        if isinstance(value, int) and not isinstance(value, bool):
+            return str(value).encode()
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _ttl(self, timeout):
+        """Срок жизни в миллисекундах; None - бессрочно."""
+        expires = self.get_backend_timeout(timeout)
+        if expires is None:
+            return None
+        return int((expires - time.time()) * 1000)
+
+    def _set(self, key, value, timeout, *flags):
+        ttl = self._ttl(timeout)
+        if ttl is not None and ttl <= 0:
+            if not flags:
+                self.client.call('DEL', key)
+            return False
+        args = ['SET', key, self._dump(value), *flags]
+        if ttl is not None:
+            args += ['PX', ttl]
+        return self.client.call(*args) == 'OK'
+
+    def get(self, key, default=None, version=None):
+        data = self.client.call('GET', self._key(key, version))
+        return default if data is None else self._load(data)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._set(self._key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._set(self._key(key, version), value, timeout, 'NX')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl is None:
+            return bool(self.client.call('PERSIST', key)) or self.has_key(
+                key, raw=True
+            )
+        return bool(self.client.call('PEXPIRE', key, max(ttl, 1)))
+
+    def delete(self, key, version=None):
+        self.client.call('DEL', self._key(key, version))
+
+    def has_key(self, key, version=None, raw=False):
+        if not raw:
+            key = self._key(key, version)
+        return bool(self.client.call('EXISTS', key))
+
+    def incr(self, key, delta=1, version=None):
+        # INCRBY создал бы отсутствующий ключ, а Django ждёт ValueError.
+        value = self.client.call(
+            'EVAL', INCR_EXISTING, 1, self._key(key, version), delta
+        )
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def clear(self):
+        self.client.call('FLUSHDB')
+
+    def close(self, **kwargs):
+        self.client.close()
+
+
+class TieredCache(BaseCache):
+    """LRU процесса перед общим кешем OPTIONS['SHARED'].
+
+    delete(), incr() и clear() увеличивают в общем кеше номер версии
+    L1. Каждый процесс сверяет его не чаще раза в POLL_INTERVAL секунд
+    и при расхождении очищает свой L1 целиком. Так сброс из сигналов
+    доходит до всех воркеров не позже чем за POLL_INTERVAL, а запись
+    set() из другого процесса - не позже чем за L1_TIMEOUT.
+
+    Значения из L1 отдаются без копирования: изменять их нельзя.
+    """
+
+    VERSION_KEY = 'l1_version'
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.l1 = LRUCache(options.get('L1_SIZE', 1000))
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.poll_interval = options.get('POLL_INTERVAL', 1)
+        self._seen = MISSING
+        self._next_poll = 0.0
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _sync(self):
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_interval
+        version = self.shared.get(self.VERSION_KEY)
+        if version != self._seen:
+            self.l1.clear()
+            self._seen = version
+
+    def _broadcast(self):
+        """Сообщает остальным процессам, что их L1 устарел."""
+        try:
+            version = self.shared.incr(self.VERSION_KEY)
+        except ValueError:
+            self.shared.add(self.VERSION_KEY, 1, None)
+            return
+        # Свой L1 уже исправлен. Если между сверками версию никто
+        # больше не менял, очищать его при следующей сверке незачем.
+        if self._seen == version - 1:
+            self._seen = version
+
+    def _l1_key(self, key, version):
+        key = self.shared.make_key(key, version=version)
+        self.shared.validate_key(key)
+        return key
+
+    def _remember(self, l1_key, value, timeout=DEFAULT_TIMEOUT):
+        # Сверка до записи, иначе первая же сверка выбросит это значение.
+        self._sync()
+        expires = time.monotonic() + self.l1_timeout
+        backend_expires = self.shared.get_backend_timeout(timeout)
+        if backend_expires is not None:
+            expires = min(
+                expires, time.monotonic() + backend_expires - time.time()
+            )
+        self.l1.set(l1_key, (value, expires))
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        l1_key = self._l1_key(key, version)
+        entry = self.l1.get(l1_key)
+        if entry is not None and entry[1] > time.monotonic():
+            metrics.inc('yatube_cache_l1_total', result='hit')
+            return entry[0]
+        metrics.inc('yatube_cache_l1_total', result='miss')
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.l1.delete(l1_key)
+            return default
+        self._remember(l1_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._l1_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self._l1_key(key, version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(self._l1_key(key, version))
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(self._l1_key(key, version))
+        self.shared.delete(key, version=version)
+        self._broadcast()
+
+    def has_key(self, key, version=None):
+        self._sync()
+        entry = self.l1.get(self._l1_key(key, version))
+        if entry is not None and entry[1] > time.monotonic():
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        l1_key = self._l1_key(key, version)
+        self.l1.delete(l1_key)
+        value = self.shared.incr(key, delta, version=version)
+        self._broadcast()
+        return value
+
+    def clear(self):
+        self.l1.clear()
+        self.shared.clear()
+        self._seen = MISSING
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
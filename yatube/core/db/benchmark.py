@@ -0,0 +1,117 @@
+"""Сравнение пропускной способности бэкендов SQLite под конкурентной
+записью.
+
+Для каждого бэкенда создаётся отдельный файл базы с одной таблицей, и
+threads потоков гоняют смесь операций: чтение последних строк и
+транзакцию "прочитать, затем записать" - так устроены get_or_create и
+счётчики постов. Считаются операции в секунду, перцентили задержки
+записи и ошибки "database is locked".
+"""
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connections, transaction
+
+from posts.benchmark import percentile
+
+ENGINES = {
+    'stock': 'django.db.backends.sqlite3',
+    'tuned': 'core.db.sqlite3',
+}
+
+SCHEMA = (
+    'CREATE TABLE bench (id INTEGER PRIMARY KEY, value INTEGER NOT NULL,'
+    ' text TEXT NOT NULL)'
+)
+
+
+def _read(cursor):
+    cursor.execute('SELECT id, value, text FROM bench ORDER BY id DESC'
+                   ' LIMIT 10')
+    cursor.fetchall()
+
+
+def _write(alias):
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(value), 0) FROM bench')
+            value = cursor.fetchone()[0] + 1
+            cursor.execute(
+                'INSERT INTO bench (value, text) VALUES (%s, %s)',
+                [value, 'x' * 200],
+            )
+
+
+def _worker(alias, operations, write_ratio, seed):
+    rnd = random.Random(seed)
+    samples = []
+    try:
+        for _ in range(operations):
+            is_write = rnd.random() < write_ratio
+            start = time.perf_counter()
+            try:
+                if is_write:
+                    _write(alias)
+                else:
+                    with connections[alias].cursor() as cursor:
+                        _read(cursor)
+                failed = False
+            except OperationalError:
+                failed = True
+            samples.append((is_write, time.perf_counter() - start, failed))
+    finally:
+        connections[alias].close()
+    return samples
+
+
+def run_engine(engine, threads=8, operations=200, write_ratio=0.3,
+               timeout=5):
+    """Прогон одного бэкенда на новой базе; возвращает строку отчёта."""
+    alias = f'benchmark_{engine.replace(".", "_")}'
+    with tempfile.TemporaryDirectory() as directory:
+        connections.databases[alias] = {
+            'ENGINE': engine,
+            'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+            'OPTIONS': {'timeout': timeout},
+        }
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(SCHEMA)
+            connections[alias].close()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                futures = [
+                    pool.submit(_worker, alias, operations, write_ratio, i)
+                    for i in range(threads)
+                ]
+                samples = [
+                    sample for future in futures
+                    for sample in future.result()
+                ]
+            elapsed = time.perf_counter() - start
+        finally:
+            connections[alias].close()
+            del connections.databases[alias]
+    writes = [
+        duration * 1000 for is_write, duration, failed in samples
+        if is_write and not failed
+    ]
+    done = sum(1 for sample in samples if not sample[2])
+    return {
+        'engine': engine,
+        'operations': len(samples),
+        'elapsed': elapsed,
+        'ops': done / elapsed if elapsed else 0.0,
+        'writes': len(writes),
+        'errors': sum(1 for sample in samples if sample[2]),
+        'write_p50_ms': percentile(writes, 50),
+        'write_p95_ms': percentile(writes, 95),
+        'write_p99_ms': percentile(writes, 99),
+    }
+
+
+def run(engines=tuple(ENGINES), **options):
+    return [run_engine(ENGINES[name], **options) for name in engines]
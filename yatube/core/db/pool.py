@@ -0,0 +1,153 @@
+"""Пул соединений с базой на процесс.
+
+Без пула Django открывает соединение на каждый запрос и закрывает его
+в конце. Здесь закрытие возвращает соединение в пул, а следующий
+запрос любого потока получает его обратно:
+
+* в пуле живут не больше size соединений; ещё max_overflow открываются
+  при нехватке и закрываются при возврате;
+* когда выданы все, checkout() ждёт не дольше timeout секунд и
+  поднимает PoolTimeout;
+* при выдаче соединение проверяется запросом SELECT 1 (pre_ping), а
+  соединения старше max_lifetime секунд заменяются новыми.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.utils import OperationalError
+
+from core import metrics
+
+
+class PoolTimeout(OperationalError):
+    """Свободного соединения не нашлось за timeout секунд."""
+
+
+class ConnectionPool:
+    def __init__(self, alias, size=5, max_overflow=10, timeout=10,
+                 max_lifetime=30 * 60, pre_ping=True):
+        self.alias = alias
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._created = {}
+        self._open = 0
+        self._condition = threading.Condition()
+
+    def _record(self, result):
+        metrics.inc(
+            'yatube_db_pool_connections_total', result=result,
+            database=self.alias,
+        )
+
+    def _usable(self, connection):
+        created = self._created[id(connection)]
+        if time.monotonic() - created > self.max_lifetime:
+            self._record('recycled')
+            return False
+        if self.pre_ping:
+            try:
+                connection.execute('SELECT 1').fetchone()
+            except Exception:
+                self._record('ping_failed')
+                return False
+        return True
+
+    def _discard(self, connection):
+        self._created.pop(id(connection), None)
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def checkout(self, connect):
+        """Соединение из пула или новое от connect()."""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        connection = None
+        with self._condition:
+            while True:
+                if self._idle:
+                    # LIFO: реже используемые соединения состарятся
+                    # и закроются сами.
+                    connection = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._record('timeout')
+                    raise PoolTimeout(
+                        f'Пул {self.alias}: все {self._open} соединений '
+                        f'заняты дольше {self.timeout} с'
+                    )
+                self._condition.wait(remaining)
+            overflow = self._open > self.size
+        metrics.observe(
+            'yatube_db_pool_wait_seconds', time.monotonic() - started,
+            database=self.alias,
+        )
+        if connection is not None and not self._usable(connection):
+            self._discard(connection)
+            connection = None
+        if connection is None:
+            try:
+                connection = connect()
+            except BaseException:
+                with self._condition:
+                    self._open -= 1
+                    self._condition.notify()
+                raise
+            self._created[id(connection)] = time.monotonic()
+            self._record('created')
+        else:
+            self._record('reused')
+        if overflow:
+            metrics.inc('yatube_db_pool_overflow_total', database=self.alias)
+        metrics.inc('yatube_db_pool_in_use', 1, database=self.alias)
+        return connection
+
+    def checkin(self, connection):
+        """Возвращает соединение; лишнее или сломанное закрывается."""
+        metrics.inc('yatube_db_pool_in_use', -1, database=self.alias)
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self._condition:
+            if healthy and len(self._idle) < self.size:
+                self._idle.append(connection)
+            else:
+                self._discard(connection)
+                self._open -= 1
+                self._record('closed')
+            self._condition.notify()
+
+    def close(self):
+        """Закрывает простаивающие соединения."""
+        with self._condition:
+            while self._idle:
+                self._discard(self._idle.pop())
+                self._open -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, name, options):
+    """Пул процесса для файла name; после fork создаётся новый."""
+    key = (os.getpid(), alias, name)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(alias, **options)
+        return pool
@@ -0,0 +1,118 @@
+"""Чтение с реплик с гарантией "читаю свои записи".
+
+ReplicaMiddleware выбирает базу для чтения на время запроса: страницы
+REPLICA_VIEWS читают со случайной реплики из DATABASE_REPLICAS, всё
+остальное - с основной базы. Запись всегда идёт в основную базу, а
+после запроса с записью пользователь получает cookie и REPLICA_PIN
+секунд читает только с основной базы, где его запись точно есть.
+
+Реплика, которая отстала больше чем на REPLICA_MAX_LAG секунд или не
+отвечает, не используется, пока не догонит.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+
+from core import metrics
+
+_state = threading.local()
+_health = {}
+_health_lock = threading.Lock()
+
+
+def use(alias):
+    """Читать с alias до конца запроса; None - с основной базы."""
+    _state.read_alias = alias
+
+
+def reset():
+    _state.read_alias = None
+    _state.wrote = False
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+def write_heartbeat():
+    from core.models import ReplicationHeartbeat
+
+    now = time.time()
+    heartbeats = ReplicationHeartbeat.objects.using(DEFAULT_DB_ALIAS)
+    if not heartbeats.filter(pk=1).update(written=now):
+        heartbeats.get_or_create(pk=1, defaults={'written': now})
+
+
+def _written(alias):
+    from core.models import ReplicationHeartbeat
+
+    return ReplicationHeartbeat.objects.using(alias).filter(
+        pk=1
+    ).values_list('written', flat=True).first()
+
+
+def replica_lag(alias):
+    """Отставание реплики в секундах; None - реплика недоступна."""
+    try:
+        replica = _written(alias)
+        primary = _written(DEFAULT_DB_ALIAS)
+    except DatabaseError:
+        return None
+    if primary is None:
+        return 0.0
+    if replica is None:
+        return float('inf')
+    return max(primary - replica, 0.0)
+
+
+def is_healthy(alias):
+    """Годится ли реплика; ответ проверяется раз в REPLICA_CHECK_INTERVAL."""
+    now = time.monotonic()
+    with _health_lock:
+        checked, healthy = _health.get(alias, (None, False))
+        if checked is not None and now - checked < (
+            settings.REPLICA_CHECK_INTERVAL
+        ):
+            return healthy
+        # Пока идёт проверка, остальные потоки видят прошлый ответ.
+        _health[alias] = (now, healthy)
+    lag = replica_lag(alias)
+    healthy = lag is not None and lag <= settings.REPLICA_MAX_LAG
+    with _health_lock:
+        _health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Случайная исправная реплика или None."""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if is_healthy(alias):
+            return alias
+    return None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return getattr(_state, 'read_alias', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и на основной базе.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def record(result):
+    metrics.inc('yatube_db_route_total', result=result)
@@ -0,0 +1,198 @@
+"""Бэкенд SQLite для нагрузки: WAL, прагмы и очередь писателей.
+
+Стоковый бэкенд открывает файл в режиме журнала DELETE: читатели ждут
+писателя, а транзакция, которая сначала читает и потом пишет, может
+получить "database is locked" сразу, не дожидаясь busy timeout, -
+SQLite не умеет повышать блокировку чтения до записи, пока пишет
+другой. Здесь:
+
+* на каждом соединении выставляются прагмы PRAGMAS (WAL,
+  synchronous=NORMAL, mmap, кеш страниц, busy_timeout), их можно
+  переопределить в OPTIONS['pragmas'];
+* транзакции atomic() начинаются с BEGIN IMMEDIATE и сразу берут
+  блокировку записи;
+* записи одного процесса выстраиваются в очередь WriteQueue, и потоки
+  по очереди получают право писать, вместо того чтобы крутиться в
+  busy-обработчике SQLite. Межпроцессную очередь по-прежнему
+  обеспечивает busy_timeout;
+* если задан OPTIONS['pool'], соединения берутся из пула процесса
+  (core.db.pool) и возвращаются в него вместо закрытия.
+"""
+import threading
+from collections import deque
+
+from django.db.backends.sqlite3 import base
+
+from ..pool import get_pool
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение - размер в КиБ, а не в страницах.
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class WriteQueue:
+    """Блокировка, которую потоки получают в порядке очереди.
+
+    acquire() ждёт не дольше timeout секунд и возвращает False, если
+    очередь не дошла: тогда запись идёт без неё и ждёт уже в SQLite.
+    """
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._waiters = deque()
+        self._locked = False
+
+    def acquire(self, timeout):
+        with self._mutex:
+            if not self._locked:
+                self._locked = True
+                return True
+            waiter = threading.Lock()
+            waiter.acquire()
+            self._waiters.append(waiter)
+        if waiter.acquire(timeout=timeout):
+            return True
+        with self._mutex:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                # release() передал очередь в тот момент, когда истекло
+                # ожидание: блокировка уже наша.
+                return True
+        return False
+
+    def release(self):
+        with self._mutex:
+            if self._waiters:
+                # Блокировка переходит к следующему, не освобождаясь.
+                self._waiters.popleft().release()
+            else:
+                self._locked = False
+
+
+# Одна очередь на файл базы во всём процессе.
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(name):
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holds_write_slot = False
+        self.pool = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        pool_options = params.pop('pool', None)
+        self.pool = None
+        # База в памяти живёт, пока открыто соединение, - ей пул не нужен.
+        if pool_options is not None and not self.is_in_memory_db():
+            self.pool = get_pool(
+                self.alias, self.settings_dict['NAME'], pool_options
+            )
+        return params
+
+    def get_new_connection(self, conn_params):
+        if self.pool is not None:
+            return self.pool.checkout(lambda: self.connect_new(conn_params))
+        return self.connect_new(conn_params)
+
+    def connect_new(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def create_cursor(self, name=None):
+        return self.connection.cursor(factory=self.cursor_factory)
+
+    def cursor_factory(self, connection):
+        return SQLiteCursorWrapper(connection, self)
+
+    @property
+    def write_queue(self):
+        return get_queue(self.settings_dict['NAME'])
+
+    def acquire_write_slot(self):
+        if self.holds_write_slot:
+            return False
+        timeout = self.pragmas['busy_timeout'] / 1000
+        self.holds_write_slot = self.write_queue.acquire(timeout)
+        return self.holds_write_slot
+
+    def release_write_slot(self):
+        if self.holds_write_slot:
+            self.holds_write_slot = False
+            self.write_queue.release()
+
+    def _start_transaction_under_autocommit(self):
+        self.acquire_write_slot()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except BaseException:
+            self.release_write_slot()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write_slot()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write_slot()
+
+    def _close(self):
+        try:
+            if self.pool is not None and self.connection is not None:
+                self.pool.checkin(self.connection)
+                return None
+            return super()._close()
+        finally:
+            self.release_write_slot()
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    """Одиночная запись вне atomic() тоже встаёт в очередь."""
+
+    def __init__(self, connection, wrapper):
+        super().__init__(connection)
+        self.wrapper = wrapper
+
+    def _write(self, method, query, *args):
+        if (
+            self.wrapper.in_atomic_block
+            or not query.lstrip()[:7].upper().startswith(WRITE_STATEMENTS)
+        ):
+            return method(self, query, *args)
+        acquired = self.wrapper.acquire_write_slot()
+        try:
+            return method(self, query, *args)
+        finally:
+            if acquired:
+                self.wrapper.release_write_slot()
+
+    def execute(self, query, params=None):
+        return self._write(base.SQLiteCursorWrapper.execute, query, params)
+
+    def executemany(self, query, param_list):
+        return self._write(
+            base.SQLiteCursorWrapper.executemany, query, param_list
+        )
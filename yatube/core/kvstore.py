@@ -0,0 +1,93 @@
+"""Хранилище ключей sorl-thumbnail в файле SQLite.
+
+Стандартное cached_db хранилище держит ключи в кеше Django, а с
+LocMemCache у каждого процесса свой кеш: после перезапуска воркер
+заново ходит в базу, а однажды закешированный промах не видит
+миниатюру, созданную другим процессом. Здесь ключи лежат в одном
+файле SQLite в режиме WAL, общем для всех процессов и переживающем
+перезапуск, а перед ним стоит LRU процесса. В LRU попадают только
+найденные значения: промахи всегда перепроверяются в файле.
+"""
+from django.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase
+
+from . import metrics
+from .lru import LRUCache
+from .sqlite import LocalConnection
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS kvstore ('
+    ' key TEXT PRIMARY KEY, value TEXT NOT NULL'
+    ') WITHOUT ROWID'
+)
+
+
+def get_path():
+    return settings.THUMBNAIL_KVSTORE_PATH
+
+
+class KVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self.lru = LRUCache(settings.THUMBNAIL_KVSTORE_LRU_SIZE)
+        self._connection = LocalConnection(
+            get_path,
+            timeout=settings.THUMBNAIL_KVSTORE_TIMEOUT,
+            setup=lambda connection: connection.execute(SCHEMA),
+        )
+        self._lru_path = None
+
+    @property
+    def connection(self):
+        path = get_path()
+        if self._lru_path != path:
+            self.lru.clear()
+            self._lru_path = path
+        return self._connection.get()
+
+    def close(self):
+        """Закрывает соединение потока и забывает LRU процесса."""
+        self.lru.clear()
+        self._connection.close()
+
+    def _get_raw(self, key):
+        connection = self.connection
+        value = self.lru.get(key)
+        if value is not None:
+            metrics.inc('yatube_thumbnail_kvstore_total', result='memory')
+            return value
+        row = connection.execute(
+            'SELECT value FROM kvstore WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            metrics.inc('yatube_thumbnail_kvstore_total', result='miss')
+            return None
+        metrics.inc('yatube_thumbnail_kvstore_total', result='file')
+        self.lru.set(key, row[0])
+        return row[0]
+
+    def _set_raw(self, key, value):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO kvstore (key, value) VALUES (?, ?)',
+            (key, value),
+        )
+        self.lru.set(key, value)
+
+    def _delete_raw(self, *keys):
+        connection = self.connection
+        connection.executemany(
+            'DELETE FROM kvstore WHERE key = ?', [(key,) for key in keys]
+        )
+        for key in keys:
+            self.lru.delete(key)
+
+    def _find_keys_raw(self, prefix):
+        rows = self.connection.execute(
+            'SELECT key FROM kvstore WHERE substr(key, 1, ?) = ?',
+            (len(prefix), prefix),
+        )
+        return [key for key, in rows]
+
+    def clear(self):
+        super().clear()
+        self.lru.clear()
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from core.db import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоковый бэкенд SQLite и core.db.sqlite3 под '
+        'конкурентной записью из нескольких потоков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument(
+            '--operations', type=int, default=200,
+            help='Операций на поток',
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.3,
+            help='Доля пишущих транзакций, от 0 до 1',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=5,
+            help='Сколько секунд ждать блокировку SQLite',
+        )
+        parser.add_argument(
+            '--engine', action='append', choices=benchmark.ENGINES,
+            help='Бэкенд для прогона, можно несколько (по умолчанию оба)',
+        )
+
+    def handle(self, *args, **options):
+        rows = benchmark.run(
+            engines=options['engine'] or tuple(benchmark.ENGINES),
+            threads=options['threads'],
+            operations=options['operations'],
+            write_ratio=options['write_ratio'],
+            timeout=options['timeout'],
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["engine"]:28} {row["ops"]:8.1f} оп/с  '
+                f'запись p50 {row["write_p50_ms"]:6.1f} '
+                f'p95 {row["write_p95_ms"]:6.1f} '
+                f'p99 {row["write_p99_ms"]:6.1f} мс  '
+                f'ошибок {row["errors"]} из {row["operations"]}'
+            )
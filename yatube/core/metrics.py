@@ -0,0 +1,258 @@
+"""Метрики в текстовом формате Prometheus.
+
+Каждый поток пишет в собственный словарь, поэтому запись идёт без
+блокировок; при чтении словари потоков складываются. Если задан
+METRICS_DIR, процесс время от времени сбрасывает свой снимок в файл
+<pid>.json, а /metrics суммирует файлы всех воркеров. Снимки
+завершившихся процессов удаляются, иначе их счётчики после перезапуска
+воркеров складывались бы вечно; поэтому METRICS_DIR общий только для
+процессов одного хоста.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+COUNTER = 'counter'
+# Значение, которое ходит вверх и вниз: пишется через inc() со знаком,
+# поэтому потоки и процессы складываются так же, как у счётчиков.
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'yatube_request_duration_seconds': (
+        HISTOGRAM, 'Время обработки запроса', LATENCY_BUCKETS
+    ),
+    'yatube_response_size_bytes': (
+        HISTOGRAM, 'Размер ответа', SIZE_BUCKETS
+    ),
+    'yatube_db_queries': (
+        HISTOGRAM, 'SQL-запросов на запрос', QUERY_BUCKETS
+    ),
+    'yatube_db_duration_seconds': (
+        HISTOGRAM, 'Время SQL-запросов на запрос', LATENCY_BUCKETS
+    ),
+    'yatube_fragment_cache_total': (
+        COUNTER, 'Обращения к кешу фрагментов лент', None
+    ),
+    'yatube_thumbnail_duration_seconds': (
+        HISTOGRAM, 'Время генерации миниатюры', LATENCY_BUCKETS
+    ),
+    'yatube_thumbnail_kvstore_total': (
+        COUNTER, 'Обращения к хранилищу ключей миниатюр', None
+    ),
+    'yatube_cache_l1_total': (
+        COUNTER, 'Обращения к кешу процесса перед общим кешем', None
+    ),
+    'yatube_cache_fetch_total': (
+        COUNTER, 'Чтения значений, защищённых от лавины пересчётов', None
+    ),
+    'yatube_page_cache_total': (
+        COUNTER, 'Обращения анонимов к кешу страниц', None
+    ),
+    'yatube_db_route_total': (
+        COUNTER, 'Выбор базы для чтения страниц с репликами', None
+    ),
+    'yatube_db_pool_wait_seconds': (
+        HISTOGRAM, 'Ожидание соединения из пула', LATENCY_BUCKETS
+    ),
+    'yatube_db_pool_in_use': (
+        GAUGE, 'Соединений пула, выданных сейчас', None
+    ),
+    'yatube_db_pool_overflow_total': (
+        COUNTER, 'Выдачи сверх постоянного размера пула', None
+    ),
+    'yatube_db_pool_connections_total': (
+        COUNTER, 'Открытые и закрытые пулом соединения', None
+    ),
+    'yatube_search_duration_seconds': (
+        HISTOGRAM, 'Время поиска по индексу', LATENCY_BUCKETS
+    ),
+}
+
+_local = threading.local()
+_shards = []
+_last_flush = 0.0
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = {}
+        _shards.append(shard)
+    return shard
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    shard = _shard()
+    key = _key(name, labels)
+    shard[key] = shard.get(key, 0) + value
+
+
+def observe(name, value, **labels):
+    buckets = METRICS[name][2]
+    shard = _shard()
+    key = _key(name, labels)
+    # Счётчики корзин, затем сумма и количество наблюдений.
+    sample = shard.get(key)
+    if sample is None:
+        sample = shard[key] = [0] * (len(buckets) + 2)
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            sample[i] += 1
+    sample[-2] += value
+    sample[-1] += 1
+
+
+@contextmanager
+def timer(name, **labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def _merge(total, key, value):
+    if isinstance(value, list):
+        current = total.get(key)
+        if current is None:
+            total[key] = list(value)
+        else:
+            total[key] = [a + b for a, b in zip(current, value)]
+    else:
+        total[key] = total.get(key, 0) + value
+
+
+def snapshot():
+    """Сумма метрик всех потоков этого процесса."""
+    total = {}
+    for shard in list(_shards):
+        for key, value in dict(shard).items():
+            _merge(total, key, value)
+    return total
+
+
+def _path(pid):
+    return os.path.join(settings.METRICS_DIR, f'{pid}.json')
+
+
+def flush(force=False):
+    """Сбрасывает снимок процесса в METRICS_DIR не чаще раза в интервал."""
+    global _last_flush
+    if not settings.METRICS_DIR:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    data = [
+        [name, list(labels), value]
+        for (name, labels), value in snapshot().items()
+    ]
+    path = _path(os.getpid())
+    tmp_path = f'{path}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as tmp:
+        json.dump(data, tmp)
+    os.replace(tmp_path, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        return True
+    return True
+
+
+def _worker_snapshots():
+    """Файлы снимков живых воркеров, кроме своего; чужие мёртвые удаляются."""
+    for filename in os.listdir(settings.METRICS_DIR):
+        pid, extension = os.path.splitext(filename)
+        if extension != '.json' or not pid.isdigit():
+            continue
+        if int(pid) == os.getpid():
+            continue
+        path = os.path.join(settings.METRICS_DIR, filename)
+        if _alive(int(pid)):
+            yield path
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def collect():
+    """Метрики этого процесса и снимки остальных живых воркеров."""
+    total = snapshot()
+    if not settings.METRICS_DIR or not os.path.isdir(settings.METRICS_DIR):
+        return total
+    for path in _worker_snapshots():
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data:
+            _merge(total, (name, tuple(map(tuple, labels))), value)
+    return total
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs
+    )
+    return '{' + body + '}'
+
+
+def render(samples):
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted(
+            (labels, value) for (metric, labels), value in samples.items()
+            if metric == name
+        )
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in series:
+            if kind in (COUNTER, GAUGE):
+                lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            for bound, count in zip(buckets, value):
+                lines.append(
+                    f'{name}_bucket{_labels(labels, le=bound)} {count}'
+                )
+            lines.append(
+                f'{name}_bucket{_labels(labels, le="+Inf")} {value[-1]}'
+            )
+            lines.append(f'{name}_sum{_labels(labels)} {value[-2]}')
+            lines.append(f'{name}_count{_labels(labels)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,172 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+from .db import router
+
+logger = logging.getLogger(__name__)
+
+# Управление транзакциями - не запросы страницы: BEGIN IMMEDIATE
+# (core.db.sqlite3) и точки сохранения повторяются при каждой записи.
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE',
+)
+
+
+class QueryBudgetExceeded(Exception):
+    """Страница выполнила больше SQL-запросов, чем ей разрешено."""
+
+
+class QueryStats:
+    """Обёртка execute_wrapper: считает запросы, их время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            if not sql.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+                self.count += 1
+                # Текст запроса без параметров: одинаковый SQL с разными
+                # параметрами - признак N+1.
+                self.fingerprints[sql] += 1
+
+    def duplicates(self, limit):
+        return {
+            sql: count for sql, count in self.fingerprints.items()
+            if count > limit
+        }
+
+
+class QueryBudgetMiddleware:
+    """Следит за числом SQL-запросов на страницу.
+
+    Превышение QUERY_BUDGETS (или QUERY_BUDGET_DEFAULT) и запросы,
+    повторённые больше QUERY_DUPLICATE_LIMIT раз, пишутся в лог или,
+    при QUERY_BUDGET_RAISE, поднимают QueryBudgetExceeded. При
+    SERVER_TIMING разбивка времени отдаётся в заголовке Server-Timing.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        duplicates = stats.duplicates(settings.QUERY_DUPLICATE_LIMIT)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={stats.duration * 1000:.2f};'
+                f'desc="{stats.count} queries"',
+                f'dup;desc="{len(duplicates)} duplicated"',
+                f'total;dur={total * 1000:.2f}',
+            ))
+        self.check_budget(request, stats, duplicates)
+        return response
+
+    def check_budget(self, request, stats, duplicates):
+        view_name = getattr(request.resolver_match, 'view_name', None)
+        budget = settings.QUERY_BUDGETS.get(
+            view_name, settings.QUERY_BUDGET_DEFAULT
+        )
+        problems = []
+        if budget is not None and stats.count > budget:
+            problems.append(
+                f'{stats.count} запросов при бюджете {budget}'
+            )
+        for sql, count in duplicates.items():
+            problems.append(f'{count} раз: {sql}')
+        if not problems:
+            return
+        message = f'{request.path} ({view_name}): ' + '; '.join(problems)
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class MetricsMiddleware:
+    """Собирает время, размер ответа и число SQL-запросов по view_name."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        view = getattr(request.resolver_match, 'view_name', None)
+        view = view or 'unresolved'
+        metrics.observe(
+            'yatube_request_duration_seconds',
+            time.perf_counter() - start,
+            view=view,
+        )
+        if not response.streaming:
+            metrics.observe(
+                'yatube_response_size_bytes', len(response.content), view=view
+            )
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            metrics.observe('yatube_db_queries', stats.count, view=view)
+            metrics.observe(
+                'yatube_db_duration_seconds', stats.duration, view=view
+            )
+        metrics.flush()
+        return response
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтения и закрепляет писавших за основной.
+
+    Стоит до всего, что читает из базы. Без DATABASE_REPLICAS ничего
+    не делает.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        router.reset()
+        try:
+            response = self.get_response(request)
+            if settings.DATABASE_REPLICAS and router.wrote():
+                router.write_heartbeat()
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE, '1',
+                    max_age=settings.REPLICA_PIN,
+                    httponly=True, samesite='Lax',
+                )
+        finally:
+            router.reset()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not settings.DATABASE_REPLICAS
+            or request.method not in ('GET', 'HEAD')
+            or request.resolver_match.view_name not in settings.REPLICA_VIEWS
+        ):
+            return None
+        if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            router.record('pinned')
+            return None
+        alias = router.choose_replica()
+        router.record('replica' if alias else 'lagging')
+        router.use(alias)
+        return None
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicationHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('written', models.FloatField(verbose_name='Записано, с от эпохи')),
+            ],
+            options={
+                'verbose_name': 'Отметка репликации',
+            },
+        ),
+    ]
@@ -13,3 +13,36 @@ class PubDateModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CountersModel(models.Model):
+    """Абстрактная модель. Не затирает счётчики при сохранении объекта.
+
+    Счётчики меняются атомарными UPDATE в обход экземпляра, поэтому
+    save() уже загруженного объекта пишет все поля, кроме counter_fields.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class ReplicationHeartbeat(models.Model):
+    """Время последней записи через сайт на основной базе.
+
+    Строка реплицируется вместе с остальными данными, и разница между
+    её значением на основной базе и на реплике - отставание реплики.
+    """
+    written = models.FloatField(verbose_name='Записано, с от эпохи')
+
+    class Meta:
+        verbose_name = 'Отметка репликации'
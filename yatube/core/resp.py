@@ -0,0 +1,90 @@
+"""Минимальный клиент протокола Redis (RESP2) без сторонних пакетов.
+
+Умеет ровно то, что нужно кешу: отправить команду и разобрать ответ.
+У каждой пары (процесс, поток) своё соединение, как у core.sqlite.
+"""
+import os
+import socket
+import threading
+
+
+class RESPError(Exception):
+    """Сервер ответил ошибкой (-ERR ...)."""
+
+
+def encode(args):
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode()
+        elif isinstance(arg, int):
+            arg = str(arg).encode()
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b'\r\n'):
+        raise ConnectionError('Соединение с сервером закрыто')
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode()
+    if kind == b'-':
+        raise RESPError(body.decode())
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length == -1:
+            return None
+        return reader.read(length + 2)[:-2]
+    if kind == b'*':
+        length = int(body)
+        if length == -1:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise RESPError(f'Неизвестный ответ: {line!r}')
+
+
+class Client:
+    def __init__(self, host='127.0.0.1', port=6379, db=0, timeout=1.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            sock = socket.create_connection(
+                (self.host, self.port), self.timeout
+            )
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            local.sock, local.reader = sock, sock.makefile('rb')
+            local.pid = os.getpid()
+            if self.db:
+                self._call('SELECT', self.db)
+        return local.sock, local.reader
+
+    def _call(self, *args):
+        sock, reader = self._local.sock, self._local.reader
+        sock.sendall(encode(args))
+        return read_reply(reader)
+
+    def call(self, *args):
+        self._connect()
+        try:
+            return self._call(*args)
+        except (OSError, ConnectionError):
+            # Оборванное соединение откроется заново при следующем вызове.
+            self.close()
+            raise
+
+    def close(self):
+        local = self._local
+        if getattr(local, 'pid', None) is not None:
+            local.reader.close()
+            local.sock.close()
+        local.pid = None
@@ -0,0 +1,53 @@
+import copy
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from sorl.thumbnail import default
+
+
+@contextmanager
+def isolated_environment():
+    """Те же кеши, что у сайта, но во временных файлах.
+
+    Тесты работают с TieredCache и SQLiteCache из настроек, но файл
+    общего кеша (даже если задан REDIS_URL) и хранилище ключей миниатюр
+    живут только до конца прогона: тесты не видят записей прошлых
+    прогонов и не трогают кеш рабочей копии. Превышение бюджета
+    SQL-запросов в тестах падает исключением.
+
+    Нужен и manage.py test (TestRunner), и pytest (conftest.py).
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        caches = copy.deepcopy(settings.CACHES)
+        shared = caches['default']['OPTIONS']['SHARED']
+        caches[shared] = {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+            'OPTIONS': caches[shared].get('OPTIONS', {}),
+        }
+        with override_settings(
+            CACHES=caches,
+            THUMBNAIL_KVSTORE_PATH=os.path.join(
+                directory, 'thumbnails.sqlite3'
+            ),
+            QUERY_BUDGET_RAISE=True,
+        ):
+            yield
+        default.kvstore.close()
+
+
+class TestRunner(DiscoverRunner):
+    """Прогон тестов в isolated_environment()."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.environment = isolated_environment()
+        self.environment.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.environment.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,48 @@
+"""Соединения с локальными файлами SQLite, общими для процессов.
+
+Файл открывается в режиме WAL: читатели не ждут писателя, а писатели
+разных процессов по очереди берут блокировку с ожиданием timeout.
+Соединение SQLite нельзя делить между потоками и между процессами
+после fork, поэтому у каждой пары (процесс, поток) оно своё.
+"""
+import os
+import sqlite3
+import threading
+
+
+def connect(path, timeout=5):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    # isolation_level=None: транзакции открываются явно через BEGIN.
+    connection = sqlite3.connect(
+        path, timeout=timeout, isolation_level=None
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+class LocalConnection:
+    """Соединение текущего потока с файлом, путь которого даёт get_path."""
+
+    def __init__(self, get_path, timeout=5, setup=None):
+        self.get_path = get_path
+        self.timeout = timeout
+        self.setup = setup
+        self._local = threading.local()
+
+    def get(self):
+        local = self._local
+        key = (os.getpid(), self.get_path())
+        if getattr(local, 'key', None) != key:
+            connection = connect(key[1], self.timeout)
+            if self.setup:
+                self.setup(connection)
+            local.connection = connection
+            local.key = key
+        return local.connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+        self._local.connection = self._local.key = None
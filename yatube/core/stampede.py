@@ -0,0 +1,90 @@
+"""Защита от лавины пересчётов при истечении кеша.
+
+fetch() хранит рядом со значением время его расчёта и мягкий срок
+годности. Значение пересчитывает только один запрос - тот, кто взял
+блокировку ключа в общем кеше, а остальные в это время:
+
+* получают старое значение, если оно есть (stale-while-revalidate):
+  запись живёт в кеше ещё CACHE_STALE_TIMEOUT секунд после мягкого
+  срока;
+* ждут, пока значение появится, если старого нет.
+
+Кроме того, незадолго до мягкого срока каждый запрос с вероятностью,
+растущей к концу срока и со временем расчёта, пересчитывает значение
+заранее (алгоритм XFetch), поэтому дорогие значения обычно
+обновляются до того, как истекут.
+"""
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+
+from . import metrics
+
+
+def _lock_cache(cache):
+    # Блокировка должна сразу быть видна всем процессам, поэтому она
+    # ставится в общий кеш в обход L1 процесса (core.cache.TieredCache).
+    return getattr(cache, 'shared', cache)
+
+
+def _fresh(expires, delta, now):
+    if expires is None:
+        return True
+    # 1 - random() лежит в (0, 1], логарифм от него не падает.
+    early = delta * settings.CACHE_EARLY_BETA * -math.log(
+        1.0 - random.random()
+    )
+    return now + early < expires
+
+
+def _store(cache, key, compute, timeout):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    if timeout is None:
+        cache.set(key, (value, delta, None), None)
+    else:
+        cache.set(
+            key,
+            (value, delta, time.time() + timeout),
+            timeout + settings.CACHE_STALE_TIMEOUT,
+        )
+    return value
+
+
+def _record(result):
+    metrics.inc('yatube_cache_fetch_total', result=result)
+
+
+def fetch(key, compute, timeout, cache=default_cache):
+    """Значение key из кеша или compute(), посчитанное одним запросом."""
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expires = entry
+        if _fresh(expires, delta, time.time()):
+            _record('hit')
+            return value
+    locks = _lock_cache(cache)
+    lock_key = f'{key}.lock'
+    if locks.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            _record('computed')
+            return _store(cache, key, compute, timeout)
+        finally:
+            locks.delete(lock_key)
+    if entry is not None:
+        _record('stale')
+        return entry[0]
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(settings.CACHE_WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            _record('coalesced')
+            return entry[0]
+    # Владелец блокировки не успел или упал: считаем сами.
+    _record('computed')
+    return _store(cache, key, compute, timeout)
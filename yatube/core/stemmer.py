@@ -0,0 +1,133 @@
+"""Русский стеммер Snowball (алгоритм Портера для русского языка).
+
+Отрезает от слова окончание и словообразовательные суффиксы, чтобы
+разные формы слова давали одну основу: "котами", "кота" и "коты" -
+"кот". Описание алгоритма:
+https://snowballstem.org/algorithms/russian/stemmer.html
+
+Слово должно быть в нижнем регистре. Слова без кириллицы
+возвращаются как есть.
+"""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+
+def _endings(preceded, plain):
+    """Окончания от длинных к коротким с признаком "после а или я"."""
+    return tuple(sorted(
+        [(ending, True) for ending in preceded]
+        + [(ending, False) for ending in plain],
+        key=lambda item: len(item[0]), reverse=True,
+    ))
+
+
+PERFECTIVE_GERUND = _endings(
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = _endings(
+    (),
+    (
+        'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+        'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую',
+        'юю', 'ая', 'яя', 'ою', 'ею',
+    ),
+)
+PARTICIPLE = _endings(
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = _endings((), ('ся', 'сь'))
+VERB = _endings(
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = _endings(
+    (),
+    (
+        'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+        'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+        'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+        'ья', 'я',
+    ),
+)
+SUPERLATIVE = _endings((), ('ейш', 'ейше'))
+DERIVATIONAL = _endings((), ('ост', 'ость'))
+
+CYRILLIC = re.compile('[а-я]')
+
+
+def _region(word, start):
+    """Позиция после первой согласной, идущей за гласной, от start."""
+    for i in range(start + 1, len(word)):
+        if word[i] not in VOWELS and word[i - 1] in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, start, endings):
+    """Отрезает самое длинное окончание из endings, лежащее после start.
+
+    Окончания первой группы отрезаются, только если перед ними стоит
+    "а" или "я" (она остаётся в слове). Возвращает None, если ни одно
+    окончание не подошло.
+    """
+    for ending, preceded in endings:
+        cut = len(word) - len(ending)
+        if cut < start or not word.endswith(ending):
+            continue
+        if not preceded or (cut > start and word[cut - 1] in 'ая'):
+            return word[:cut]
+    return None
+
+
+def _strip_adjectival(word, start):
+    stripped = _strip(word, start, ADJECTIVE)
+    if stripped is None:
+        return None
+    return _strip(stripped, start, PARTICIPLE) or stripped
+
+
+# Словарь сайта невелик, а тексты повторяют одни и те же слова.
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv = next(
+        (i + 1 for i, char in enumerate(word) if char in VOWELS), len(word)
+    )
+    r2 = _region(word, _region(word, 0))
+
+    # Шаг 1: деепричастие или (возвратная частица и) окончание
+    # прилагательного, глагола или существительного.
+    stripped = _strip(word, rv, PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stripped = (
+            _strip_adjectival(word, rv)
+            or _strip(word, rv, VERB)
+            or _strip(word, rv, NOUN)
+        )
+    word = stripped or word
+    # Шаг 2.
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    # Шаг 3: словообразовательный суффикс в R2.
+    word = _strip(word, r2, DERIVATIONAL) or word
+    # Шаг 4: превосходная степень, удвоенная "н" и мягкий знак.
+    word = _strip(word, rv, SUPERLATIVE) or word
+    if word.endswith('нн') and len(word) - 1 > rv:
+        word = word[:-1]
+    elif word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Права файла, если FILE_UPLOAD_PERMISSIONS не задан: mkstemp создаёт 0600.
+DEFAULT_FILE_MODE = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, где имя файла - SHA-256 его содержимого.
+
+    Загрузка пишется во временный файл и одновременно хешируется, затем
+    переименовывается в <каталог>/<2 символа хеша>/<хеш><расширение>.
+    Повторная загрузка той же картинки получает то же имя, и второй
+    копии на диске не появляется.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя выбирает _save() по содержимому, а совпадение имён здесь -
+        # это совпадение содержимого, а не конфликт.
+        return name
+
+    def _save(self, name, content):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=full_directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.remove(tmp_path)
+            else:
+                mode = self.file_permissions_mode or DEFAULT_FILE_MODE
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
@@ -1,6 +1,38 @@
+import json
+import os
+import socketserver
+import subprocess
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Post
+
+from . import metrics, stampede
+from .cache import RedisCache, SQLiteCache, TieredCache
+from .db import benchmark as db_benchmark
+from .db import router
+from .db.pool import ConnectionPool, PoolTimeout
+from .db.sqlite3.base import WriteQueue
+from .kvstore import KVStore
+from .models import ReplicationHeartbeat
+from .resp import encode
+from .stemmer import stem
+from .lru import LRUCache
+from .middleware import QueryBudgetExceeded, QueryStats
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +40,624 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+# Бюджет считается по запросам самой страницы, а не ответа из кеша.
+@override_settings(PAGE_CACHE_VIEWS=())
+class QueryBudgetMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.user, text='Пост')
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        """Ответ содержит разбивку времени по БД."""
+        response = self.client.get(f'/profile/{self.user.username}/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('queries', response['Server-Timing'])
+
+    def test_server_timing_is_off_by_default(self):
+        response = self.client.get(f'/profile/{self.user.username}/')
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_transaction_statements_are_not_counted(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for _ in range(5):
+                with transaction.atomic():
+                    User.objects.filter(pk=1).exists()
+        self.assertEqual(stats.count, 5)
+        self.assertEqual(list(stats.duplicates(1).values()), [5])
+
+    @override_settings(
+        QUERY_BUDGET_RAISE=True, QUERY_BUDGETS={'posts:profile': 1}
+    )
+    def test_budget_exceeded_raises(self):
+        """Превышение бюджета падает исключением."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(f'/profile/{self.user.username}/')
+
+    @override_settings(
+        QUERY_BUDGET_RAISE=False, QUERY_BUDGETS={'posts:profile': 1}
+    )
+    def test_budget_exceeded_logs(self):
+        """Без QUERY_BUDGET_RAISE превышение пишется в лог."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(f'/profile/{self.user.username}/')
+        self.assertIn('posts:profile', logs.output[0])
+
+    def test_duplicated_queries_detected(self):
+        """Один SQL с разными параметрами считается повтором."""
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            User.objects.filter(pk=1).exists()
+            User.objects.filter(pk=2).exists()
+            Post.objects.exists()
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(list(stats.duplicates(1).values()), [2])
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    def test_metrics_endpoint(self):
+        """/metrics отдаёт гистограммы по имени view."""
+        self.client.get('/')
+        response = self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer secret'
+        )
+        content = response.content.decode()
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', content
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_count{view="posts:index"}',
+            content
+        )
+        self.assertIn('yatube_db_queries_bucket{view="posts:index"', content)
+        self.assertIn('yatube_fragment_cache_total{result=', content)
+
+    def test_metrics_require_token(self):
+        """Адрес прокси не открывает /metrics, нужен токен."""
+        for authorization in ('', 'Bearer wrong', 'secret'):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    '/metrics', REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization,
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.FORBIDDEN
+                )
+        with self.settings(METRICS_TOKEN=None):
+            response = self.client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer None'
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_workers_aggregated_through_directory(self):
+        """Снимки других воркеров в METRICS_DIR суммируются."""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(METRICS_DIR=directory):
+                other = os.path.join(directory, f'{os.getppid()}.json')
+                with open(other, 'w') as f:
+                    json.dump(
+                        [['yatube_fragment_cache_total',
+                          [['result', 'worker']], 5]],
+                        f
+                    )
+                metrics.inc('yatube_fragment_cache_total', result='worker')
+                metrics.flush(force=True)
+                own = os.path.join(directory, f'{os.getpid()}.json')
+                self.assertTrue(os.path.exists(own))
+                samples = metrics.collect()
+        key = ('yatube_fragment_cache_total', (('result', 'worker'),))
+        self.assertEqual(samples[key], metrics.snapshot()[key] + 5)
+
+    def test_dead_workers_are_pruned(self):
+        """Снимок завершившегося воркера удаляется и не суммируется."""
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(METRICS_DIR=directory):
+                dead = os.path.join(directory, f'{worker.pid}.json')
+                with open(dead, 'w') as f:
+                    json.dump(
+                        [['yatube_fragment_cache_total',
+                          [['result', 'dead']], 5]],
+                        f
+                    )
+                samples = metrics.collect()
+                self.assertFalse(os.path.exists(dead))
+        key = ('yatube_fragment_cache_total', (('result', 'dead'),))
+        self.assertNotIn(key, samples)
+
+
+class KVStoreTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'kvstore.sqlite3')
+        settings = override_settings(THUMBNAIL_KVSTORE_PATH=path)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Два экземпляра с разными LRU - как два процесса.
+        self.first, self.second = KVStore(), KVStore()
+        self.addCleanup(self.first.close)
+        self.addCleanup(self.second.close)
+
+    def test_values_are_shared_and_misses_not_cached(self):
+        """Промах перепроверяется в файле и видит запись другого процесса."""
+        self.assertIsNone(self.second._get_raw('sorl-thumbnail||image||a'))
+        self.first._set_raw('sorl-thumbnail||image||a', '{"size": [1, 1]}')
+        self.assertEqual(
+            self.second._get_raw('sorl-thumbnail||image||a'),
+            '{"size": [1, 1]}',
+        )
+        self.assertEqual(len(self.second.lru), 1)
+
+    def test_survives_restart(self):
+        self.first._set_raw('sorl-thumbnail||image||a', 'value')
+        self.first.close()
+        self.assertEqual(KVStore()._get_raw('sorl-thumbnail||image||a'),
+                         'value')
+
+    def test_delete_and_find_keys(self):
+        self.first._set_raw('sorl-thumbnail||image||a', '1')
+        self.first._set_raw('sorl-thumbnail||thumbnails||a', '[]')
+        self.assertEqual(
+            self.first._find_keys_raw('sorl-thumbnail||image||'),
+            ['sorl-thumbnail||image||a'],
+        )
+        self.first._delete_raw('sorl-thumbnail||image||a')
+        self.assertIsNone(self.first._get_raw('sorl-thumbnail||image||a'))
+        self.first.clear()
+        self.assertEqual(self.first._find_keys_raw('sorl-thumbnail'), [])
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')),
+                         (1, None, 3))
+
+
+class SQLiteCacheTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_entries_are_shared_between_instances(self):
+        first, second = self.make_cache(), self.make_cache()
+        first.set('feed', {'html': '<li>'})
+        self.assertEqual(second.get('feed'), {'html': '<li>'})
+        self.assertTrue(second.add('counter', 1))
+        self.assertFalse(first.add('counter', 5))
+        self.assertEqual(first.incr('counter', 2), 3)
+        self.assertEqual(second.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            first.incr('missing')
+        second.clear()
+        self.assertIsNone(first.get('feed'))
+
+    def test_expired_entries_are_misses(self):
+        cache = self.make_cache()
+        cache.set('old', 1, timeout=0.01)
+        cache.set('forever', 1, timeout=None)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('old'))
+        self.assertFalse(cache.has_key('old'))
+        self.assertTrue(cache.add('old', 2))
+        self.assertTrue(cache.touch('forever', 60))
+        self.assertEqual(cache.get('forever'), 1)
+
+    def test_culls_least_recently_read(self):
+        cache = self.make_cache(
+            MAX_ENTRIES=3, CULL_FREQUENCY=3, ACCESS_RESOLUTION=0
+        )
+        for key in 'abc':
+            cache.set(key, key)
+            time.sleep(0.01)
+        cache.get('a')
+        cache.set('d', 'd')
+        self.assertEqual(
+            [cache.get(key) for key in 'abcd'], ['a', None, 'c', 'd']
+        )
+
+    def test_size_limit(self):
+        cache = self.make_cache(MAX_SIZE=3000, CULL_FREQUENCY=2)
+        for number in range(10):
+            cache.set(number, b'x' * 1000)
+        stored = [n for n in range(10) if cache.has_key(n)]
+        self.assertLessEqual(len(stored), 2)
+        self.assertIn(9, stored)
+
+
+class TieredCacheTest(TestCase):
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+
+    def make_cache(self, **options):
+        # Два экземпляра с разными L1 - как два процесса.
+        return TieredCache(None, {'OPTIONS': {'SHARED': 'shared', **options}})
+
+    def test_hot_keys_are_served_from_l1(self):
+        cache = self.make_cache()
+        cache.set('feed', 'first')
+        self.shared.set('feed', 'second')
+        self.assertEqual(cache.get('feed'), 'first')
+        self.assertEqual(self.make_cache().get('feed'), 'second')
+
+    def test_l1_entries_expire(self):
+        cache = self.make_cache(L1_TIMEOUT=0.01)
+        cache.set('feed', 'first')
+        self.shared.set('feed', 'second')
+        time.sleep(0.02)
+        self.assertEqual(cache.get('feed'), 'second')
+
+    def test_invalidation_reaches_other_processes(self):
+        writer = self.make_cache(POLL_INTERVAL=0)
+        reader = self.make_cache(POLL_INTERVAL=0)
+        lagging = self.make_cache(POLL_INTERVAL=60)
+        writer.set('generation', 1)
+        for tier in (reader, lagging):
+            self.assertEqual(tier.get('generation'), 1)
+        self.assertEqual(writer.incr('generation'), 2)
+        self.assertEqual(writer.get('generation'), 2)
+        self.assertEqual(reader.get('generation'), 2)
+        # До следующей сверки версии L1 может отдавать старое значение.
+        self.assertEqual(lagging.get('generation'), 1)
+        writer.delete('generation')
+        self.assertIsNone(reader.get('generation'))
+
+
+class StampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def compute(self, value='fresh', delay=0):
+        def compute():
+            self.calls.append(value)
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(stampede.fetch(
+                'feed', self.compute(delay=0.2), 60
+            )))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['fresh'] * 5)
+        self.assertEqual(self.calls, ['fresh'])
+
+    def test_stale_value_served_while_recomputing(self):
+        cache.set('feed', ('stale', 0.1, time.time() - 1))
+        cache.add('feed.lock', 1)
+        self.assertEqual(stampede.fetch('feed', self.compute(), 60), 'stale')
+        self.assertEqual(self.calls, [])
+        cache.delete('feed.lock')
+        self.assertEqual(stampede.fetch('feed', self.compute(), 60), 'fresh')
+
+    def test_early_recompute(self):
+        """Дорогое значение пересчитывается незадолго до срока."""
+        cache.set('feed', ('old', 10, time.time() + 5))
+        with mock.patch.object(stampede.random, 'random', return_value=0.5):
+            self.assertEqual(stampede.fetch('feed', self.compute(), 60),
+                             'fresh')
+        cache.set('feed', ('old', 0.01, time.time() + 5))
+        with mock.patch.object(stampede.random, 'random', return_value=0.5):
+            self.assertEqual(stampede.fetch('feed', self.compute(), 60),
+                             'old')
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    """Заглушка сервера Redis: команды, которыми пользуется RedisCache."""
+
+    def reply(self, value):
+        if value is None:
+            data = b'$-1\r\n'
+        elif isinstance(value, int):
+            data = b':%d\r\n' % value
+        elif isinstance(value, str):
+            data = b'+%s\r\n' % value.encode()
+        else:
+            data = encode([value])[4:]
+        self.wfile.write(data)
+
+    def alive(self, key):
+        data = self.server.data
+        if key in data and data[key][1] is not None:
+            if data[key][1] <= time.time():
+                del data[key]
+        return key in data
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            command = args[0].decode().upper()
+            with self.server.lock:
+                self.server.commands.append(command)
+                self.reply(self.execute(command, *args[1:]))
+
+    def execute(self, command, key=None, *args):
+        handler = getattr(self, 'do_' + command.lower(), None)
+        return handler(key, *args) if handler else 'OK'
+
+    def do_set(self, key, value, *args):
+        options = [arg.decode().upper() for arg in args]
+        if 'NX' in options and self.alive(key):
+            return None
+        expires = None
+        if 'PX' in options:
+            milliseconds = int(options[options.index('PX') + 1])
+            expires = time.time() + milliseconds / 1000
+        self.server.data[key] = [value, expires]
+        return 'OK'
+
+    def do_get(self, key):
+        return self.server.data[key][0] if self.alive(key) else None
+
+    def do_exists(self, key):
+        return int(self.alive(key))
+
+    def do_del(self, key):
+        return int(self.server.data.pop(key, None) is not None)
+
+    def do_incrby(self, key, delta):
+        value = int(self.server.data[key][0]) + int(delta)
+        self.server.data[key][0] = str(value).encode()
+        return value
+
+    def do_eval(self, script, numkeys, key, delta):
+        # Единственный скрипт RedisCache - INCR_EXISTING.
+        return self.do_incrby(key, delta) if self.alive(key) else None
+
+    def do_pexpire(self, key, milliseconds=None):
+        if not self.alive(key):
+            return 0
+        self.server.data[key][1] = (
+            None if milliseconds is None
+            else time.time() + int(milliseconds) / 1000
+        )
+        return 1
+
+    do_persist = do_pexpire
+
+    def do_flushdb(self, key=None):
+        self.server.data.clear()
+        return 'OK'
+
+
+class RedisCacheTest(TestCase):
+    def setUp(self):
+        server = socketserver.ThreadingTCPServer(
+            ('127.0.0.1', 0), RESPHandler
+        )
+        server.daemon_threads = True
+        server.data, server.lock = {}, threading.Lock()
+        server.commands = []
+        self.server = server
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        host, port = server.server_address
+        self.cache = RedisCache(f'redis://{host}:{port}/1', {})
+        self.addCleanup(self.cache.close)
+
+    def test_commands(self):
+        cache = self.cache
+        cache.set('feed', ['<li>'])
+        self.assertEqual(cache.get('feed'), ['<li>'])
+        self.assertIsNone(cache.get('missing'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertFalse(cache.add('counter', 5))
+        self.assertEqual(cache.incr('counter', 2), 3)
+        self.assertEqual(cache.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('old', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertFalse(cache.has_key('old'))
+        self.assertTrue(cache.touch('feed', None))
+        cache.delete('feed')
+        self.assertFalse(cache.has_key('feed'))
+        cache.clear()
+        self.assertIsNone(cache.get('counter'))
+
+    def test_incr_is_atomic(self):
+        """Проверка ключа и прибавление - одна команда сервера."""
+        self.cache.set('generation', 1)
+        self.server.commands.clear()
+        self.assertEqual(self.cache.incr('generation'), 2)
+        self.assertEqual(self.server.commands, ['EVAL'])
+
+
+class SQLiteBackendTest(TestCase):
+    def test_pragmas_on_new_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connections.databases['tuned'] = {
+                'ENGINE': 'core.db.sqlite3',
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': {'pragmas': {'cache_size': -1024}},
+            }
+            try:
+                with connections['tuned'].cursor() as cursor:
+                    values = [
+                        cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in ('journal_mode', 'synchronous',
+                                     'cache_size', 'busy_timeout')
+                    ]
+            finally:
+                connections['tuned'].close()
+                del connections.databases['tuned']
+        self.assertEqual(values, ['wal', 1, -1024, 5000])
+
+    def test_write_queue_is_fifo_with_timeout(self):
+        queue = WriteQueue()
+        order = []
+        self.assertTrue(queue.acquire(timeout=1))
+        threads = []
+        for number in range(3):
+            thread = threading.Thread(target=lambda number=number: (
+                queue.acquire(timeout=5), order.append(number),
+                queue.release(),
+            ))
+            thread.start()
+            threads.append(thread)
+            # Следующий поток встаёт в очередь после предыдущего.
+            time.sleep(0.05)
+        self.assertFalse(queue.acquire(timeout=0.01))
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, [0, 1, 2])
+
+    def test_connections_are_pooled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connections.databases['pooled'] = {
+                'ENGINE': 'core.db.sqlite3',
+                'NAME': os.path.join(directory, 'db.sqlite3'),
+                'OPTIONS': {'pool': {'size': 2}},
+            }
+            try:
+                wrapper = connections['pooled']
+                wrapper.ensure_connection()
+                first = wrapper.connection
+                wrapper.close()
+                wrapper.ensure_connection()
+                self.assertIs(wrapper.connection, first)
+            finally:
+                wrapper.close()
+                wrapper.pool.close()
+                del connections.databases['pooled']
+
+    def test_concurrent_writes_do_not_fail(self):
+        row = db_benchmark.run_engine(
+            'core.db.sqlite3', threads=4, operations=25, write_ratio=0.5
+        )
+        self.assertEqual(row['errors'], 0)
+        self.assertGreater(row['writes'], 0)
+
+
+@override_settings(DATABASE_REPLICAS=('replica',))
+class ReplicaRouterTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        # Реплика - зеркало тестовой базы: данные те же, а по запросам
+        # к ней видно, куда маршрутизатор отправил чтение.
+        connections.databases['replica'] = {
+            **connections['default'].settings_dict,
+            'TEST': {'MIRROR': 'default'},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+
+    def setUp(self):
+        router._health.clear()
+        self.user = User.objects.create_user(username='author')
+        Post.objects.create(text='Пост', author=self.user)
+
+    def replica_queries(self, url):
+        with CaptureQueriesContext(connections['replica']) as queries:
+            self.client.get(url)
+        return len(queries)
+
+    def test_feeds_read_from_replica(self):
+        self.assertGreater(self.replica_queries('/'), 0)
+        self.assertEqual(self.replica_queries('/follow/'), 0)
+
+    def test_writer_is_pinned_to_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/create/', {'text': 'Новый пост'})
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.replica_queries('/'), 0)
+        self.assertTrue(ReplicationHeartbeat.objects.exists())
+        del self.client.cookies[settings.REPLICA_PIN_COOKIE]
+        self.assertGreater(self.replica_queries('/'), 0)
+
+    def test_lagging_replica_is_skipped(self):
+        with mock.patch.object(router, 'replica_lag', return_value=60.0):
+            self.assertEqual(self.replica_queries('/'), 0)
+
+
+class ConnectionPoolTest(TestCase):
+    def make_pool(self, **options):
+        pool = ConnectionPool('test', **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def connect(self):
+        return sqlite3.connect(':memory:', check_same_thread=False)
+
+    def test_reuse_and_overflow(self):
+        pool = self.make_pool(size=1, max_overflow=1, timeout=0.05)
+        first = pool.checkout(self.connect)
+        second = pool.checkout(self.connect)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(self.connect)
+        pool.checkin(second)
+        pool.checkin(first)
+        # В пуле остаётся не больше size соединений, лишнее закрыто.
+        self.assertEqual(len(pool._idle), 1)
+        self.assertIs(pool.checkout(self.connect), second)
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        pool = self.make_pool(size=1, max_overflow=0, timeout=5)
+        connection = pool.checkout(self.connect)
+        threading.Timer(0.05, pool.checkin, [connection]).start()
+        self.assertIs(pool.checkout(self.connect), connection)
+
+    def test_broken_and_old_connections_are_replaced(self):
+        pool = self.make_pool(size=1)
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        connection.close()
+        self.assertIsNot(pool.checkout(self.connect), connection)
+
+        pool = self.make_pool(size=1, max_lifetime=0)
+        connection = pool.checkout(self.connect)
+        pool.checkin(connection)
+        self.assertIsNot(pool.checkout(self.connect), connection)
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_share_stem(self):
+        for words, expected in (
+            (('кот', 'кота', 'котами', 'коты'), 'кот'),
+            (('красивейшая', 'красивые', 'красивый'), 'красив'),
+            (('сделавшись', 'сделала'), 'сдела'),
+            (('ёлки', 'елкой'), 'елк'),
+            (('django',), 'django'),
+        ):
+            for word in words:
+                with self.subTest(word=word):
+                    self.assertEqual(stem(word), expected)
@@ -0,0 +1,135 @@
+"""Потоковая проверка загружаемых картинок.
+
+ImageUploadHandler стоит первым в FILE_UPLOAD_HANDLERS и смотрит на
+файл, пока тот ещё принимается: считает байты и по первым килобайтам
+читает только заголовок картинки - формат и размеры, без декодирования
+пикселей. Слишком большой файл или картинка-бомба отклоняются сразу:
+остаток файла дальше не буферизуется, а в request.FILES попадает
+RejectedUpload с текстом ошибки для формы.
+"""
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image
+
+INVALID_IMAGE = (
+    'Загрузите правильное изображение. Файл, который вы загрузили, '
+    'поврежден или не является изображением.'
+)
+
+
+class RejectedUpload(UploadedFile):
+    """Отклонённый при приёме файл: содержимого нет, есть ошибка."""
+
+    def __init__(self, name, content_type, error):
+        super().__init__(BytesIO(), name, content_type, 0)
+        self.upload_error = error
+
+
+def check_size(size):
+    if size > settings.UPLOAD_IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше {}.'.format(
+                filesizeformat(settings.UPLOAD_IMAGE_MAX_BYTES)
+            )
+        )
+
+
+def inspect_header(data, complete=True):
+    """Проверяет формат и размеры картинки по началу файла.
+
+    Возвращает (формат, ширина, высота). Если данных пока не хватает
+    и complete=False, возвращает None.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+            # open() читает только заголовок, пиксели не декодируются.
+            image = Image.open(BytesIO(data))
+    except Image.DecompressionBombError:
+        raise ValidationError(pixels_error())
+    except Exception:
+        if complete or len(data) >= settings.UPLOAD_IMAGE_HEADER_BYTES:
+            raise ValidationError(INVALID_IMAGE)
+        return None
+    width, height = image.size
+    if image.format not in settings.UPLOAD_IMAGE_FORMATS:
+        raise ValidationError(
+            'Формат {} не поддерживается, загрузите {}.'.format(
+                image.format, ', '.join(settings.UPLOAD_IMAGE_FORMATS)
+            )
+        )
+    if width * height > settings.UPLOAD_IMAGE_MAX_PIXELS:
+        raise ValidationError(pixels_error())
+    return image.format, width, height
+
+
+def pixels_error():
+    return 'Картинка больше {:.0f} мегапикселей.'.format(
+        settings.UPLOAD_IMAGE_MAX_PIXELS / 10 ** 6
+    )
+
+
+def validate_image(file):
+    """Проверка заголовка для файлов, пришедших в обход обработчика."""
+    check_size(file.size)
+    file.seek(0)
+    inspect_header(file.read(settings.UPLOAD_IMAGE_HEADER_BYTES))
+    file.seek(0)
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Отклоняет картинку, пока она ещё принимается."""
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name in settings.UPLOAD_IMAGE_FIELDS
+        self.received = 0
+        self.head = b''
+        self.checked = False
+        self.error = None
+
+    def reject(self, error):
+        self.error = error.messages[0]
+        # None останавливает цепочку: следующие обработчики не копят
+        # остаток файла в памяти или во временном файле.
+        return None
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        try:
+            check_size(self.received)
+            if not self.checked:
+                self.head += raw_data
+                self.checked = inspect_header(
+                    self.head, complete=False
+                ) is not None
+        except ValidationError as error:
+            return self.reject(error)
+        if self.checked:
+            self.head = b''
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        if not self.error and not self.checked:
+            try:
+                inspect_header(self.head)
+            except ValidationError as error:
+                self.reject(error)
+        if self.error:
+            return RejectedUpload(
+                self.file_name, self.content_type, self.error
+            )
+        # Файл собирает следующий обработчик цепочки.
+        return None
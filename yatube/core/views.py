@@ -1,5 +1,12 @@
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,19 @@ def permission_denied_view(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_view(request):
+    # За балансировщиком и обратным прокси REMOTE_ADDR говорит только о
+    # прокси, поэтому доступ даёт токен, а не адрес.
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    ):
+        raise PermissionDenied
+    metrics.flush(force=True)
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
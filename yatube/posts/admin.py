@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Post, Group, Comment, Follow
+from . import search, thumbnails
+from .models import Post, Group, Comment, Follow, ThumbnailTask
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -10,6 +11,18 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу posts.search вместо LIKE по всей таблице;
+        # search_fields нужен только для поля поиска в списке.
+        if not search_term:
+            return queryset, False
+        return queryset.filter(pk__in=search.search(search_term)), False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data and obj.image:
+            thumbnails.enqueue(obj.image.name)
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
@@ -26,7 +39,14 @@ class FollowAdmin(admin.ModelAdmin):
     search_fields = ('author',)
 
 
+class ThumbnailTaskAdmin(admin.ModelAdmin):
+    list_display = ('image', 'status', 'attempts', 'updated')
+    list_filter = ('status',)
+    search_fields = ('image',)
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(ThumbnailTask, ThumbnailTaskAdmin)
@@ -3,3 +3,15 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.conf import settings
+        from django.core.signals import request_started
+
+        from . import signals  # noqa: F401
+        from . import warmup
+
+        if settings.WARM_CACHE_ON_STARTUP:
+            request_started.connect(
+                warmup.warm_on_first_request, dispatch_uid='posts.warmup'
+            )
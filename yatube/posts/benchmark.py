@@ -0,0 +1,195 @@
+"""Нагрузочный прогон публичных страниц.
+
+seed() наполняет базу синтетическими данными через mixer и Faker,
+run() гоняет сценарии в несколько потоков через тестовый клиент и
+считает перцентили задержки, запросы в секунду и SQL-запросы на запрос.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from core.middleware import QueryStats
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+SCENARIOS = (
+    'index',
+    'group_posts',
+    'profile',
+    'post_detail',
+    'follow_index',
+    'post_create',
+    'add_comment',
+)
+
+
+def seed(users=50, groups=5, posts=500, comments=1000, follows=200,
+         random_seed=0):
+    """Создаёт воспроизводимый набор пользователей, постов и подписок."""
+    rnd = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+    authors = mixer.cycle(users).blend(
+        User, username=(f'bench{i}' for i in range(users))
+    )
+    group_list = mixer.cycle(groups).blend(
+        Group,
+        slug=(f'bench-{i}' for i in range(groups)),
+        title=(fake.catch_phrase() for _ in range(groups)),
+    )
+    post_list = [
+        Post.objects.create(
+            author=rnd.choice(authors),
+            group=rnd.choice(group_list + [None]),
+            text=fake.paragraph(),
+        )
+        for _ in range(posts)
+    ]
+    for _ in range(comments):
+        Comment.objects.create(
+            post=rnd.choice(post_list),
+            author=rnd.choice(authors),
+            text=fake.sentence(),
+        )
+    pairs = set()
+    while len(pairs) < min(follows, users * (users - 1)):
+        user, author = rnd.sample(authors, 2)
+        pairs.add((user, author))
+    for user, author in pairs:
+        Follow.objects.create(user=user, author=author)
+
+
+class Target:
+    """Случайные, но воспроизводимые адреса для сценариев."""
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.usernames = list(
+            User.objects.values_list('username', flat=True)
+        )
+        self.slugs = list(Group.objects.values_list('slug', flat=True))
+        self.post_ids = list(Post.objects.values_list('pk', flat=True))
+
+    def request(self, scenario):
+        rnd = self.rnd
+        if scenario == 'index':
+            return 'get', reverse('posts:index'), None
+        if scenario == 'group_posts':
+            slug = rnd.choice(self.slugs)
+            return 'get', reverse('posts:group_list', args=[slug]), None
+        if scenario == 'profile':
+            username = rnd.choice(self.usernames)
+            return 'get', reverse('posts:profile', args=[username]), None
+        if scenario == 'post_detail':
+            post_id = rnd.choice(self.post_ids)
+            return 'get', reverse('posts:post_detail', args=[post_id]), None
+        if scenario == 'follow_index':
+            return 'get', reverse('posts:follow_index'), None
+        if scenario == 'post_create':
+            return 'post', reverse('posts:post_create'), {'text': 'Бенчмарк'}
+        post_id = rnd.choice(self.post_ids)
+        return (
+            'post',
+            reverse('posts:add_comment', args=[post_id]),
+            {'text': 'Бенчмарк'},
+        )
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def _worker(worker_id, scenarios, requests, random_seed):
+    rnd = random.Random(random_seed + worker_id)
+    target = Target(rnd)
+    client = Client()
+    username = rnd.choice(target.usernames)
+    client.force_login(User.objects.get(username=username))
+    samples = []
+    try:
+        for i in range(requests):
+            scenario = scenarios[(worker_id + i) % len(scenarios)]
+            method, url, data = target.request(scenario)
+            stats = QueryStats()
+            start = time.perf_counter()
+            try:
+                with connection.execute_wrapper(stats):
+                    response = getattr(client, method)(url, data)
+                failed = response.status_code >= 400
+            except Exception:
+                # Ошибка под нагрузкой (например, блокировка SQLite) -
+                # это результат прогона, а не повод его прерывать.
+                failed = True
+            samples.append((
+                scenario,
+                time.perf_counter() - start,
+                stats.count,
+                failed,
+            ))
+    finally:
+        connections.close_all()
+    return samples
+
+
+def run(scenarios=SCENARIOS, requests=200, concurrency=4, random_seed=0):
+    """Гоняет сценарии в concurrency потоков и возвращает отчёт."""
+    per_worker = max(requests // concurrency, 1)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [
+            pool.submit(_worker, i, scenarios, per_worker, random_seed)
+            for i in range(concurrency)
+        ]
+        samples = [sample for future in futures for sample in future.result()]
+    elapsed = time.perf_counter() - start
+    report = {
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'elapsed': elapsed,
+        'rps': len(samples) / elapsed if elapsed else 0.0,
+        'scenarios': {},
+    }
+    for scenario in scenarios:
+        rows = [sample for sample in samples if sample[0] == scenario]
+        latencies = [sample[1] * 1000 for sample in rows]
+        report['scenarios'][scenario] = {
+            'requests': len(rows),
+            'errors': sum(1 for sample in rows if sample[3]),
+            'rps': len(rows) / elapsed if elapsed else 0.0,
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'queries_per_request': (
+                sum(sample[2] for sample in rows) / len(rows) if rows else 0
+            ),
+        }
+    return report
+
+
+def compare(report, baseline):
+    """Строки с изменением p95 и числа запросов относительно baseline."""
+    lines = []
+    for scenario, row in report['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(scenario)
+        if not old:
+            continue
+        lines.append(
+            f'{scenario}: p95 {old["p95_ms"]:.1f} -> {row["p95_ms"]:.1f} мс, '
+            f'запросов {old["queries_per_request"]:.1f} -> '
+            f'{row["queries_per_request"]:.1f}'
+        )
+    return lines
@@ -0,0 +1,80 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 из сигналов
+моделей, а recount() пересчитывает их целиком, если они разошлись
+с данными.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def increment(queryset, **deltas):
+    return queryset.update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def increment_user(user_id, **deltas):
+    if not increment(UserStats.objects.filter(user=user_id), **deltas):
+        UserStats.objects.get_or_create(user_id=user_id)
+        increment(UserStats.objects.filter(user=user_id), **deltas)
+
+
+def decrement_user(user_id, **deltas):
+    """Уменьшает счётчики, не создавая строку UserStats.
+
+    Вызывается из post_delete: при удалении пользователя его посты и
+    подписки удаляются каскадом, и get_or_create() вернул бы строку,
+    ссылающуюся на удалённого пользователя. Если строки нет, уменьшать
+    нечего.
+    """
+    increment(UserStats.objects.filter(user=user_id), **deltas)
+
+
+def increment_group(group_id, delta):
+    if group_id is not None:
+        increment(Group.objects.filter(pk=group_id), posts_count=delta)
+
+
+def increment_post(post_id, delta):
+    increment(Post.objects.filter(pk=post_id), comments_count=delta)
+
+
+def count_of(queryset, field):
+    """Подзапрос COUNT(*) по внешнему ключу field для UPDATE."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount():
+    """Пересчитывает все счётчики несколькими массовыми UPDATE."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk)
+            for pk in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        posts_count=count_of(Post.objects.all(), 'author'),
+        followers_count=count_of(Follow.objects.all(), 'author'),
+        following_count=count_of(Follow.objects.all(), 'user'),
+    )
+    Group.objects.update(posts_count=count_of(Post.objects.all(), 'group'))
+    Post.objects.update(
+        comments_count=count_of(Comment.objects.all(), 'post')
+    )
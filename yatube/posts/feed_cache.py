@@ -0,0 +1,68 @@
+"""Версионированный кеш фрагментов лент.
+
+Ключ фрагмента включает путь страницы, номер страницы или курсор и
+поколение лент. Поколение увеличивается сигналами при изменении постов,
+групп и пользователей, поэтому старые фрагменты просто перестают
+находиться и вытесняются кешем сами, а новые посты видны сразу.
+"""
+import hashlib
+import threading
+import time
+
+from django.core.cache import cache
+
+from core import metrics
+
+GENERATION_KEY = 'feed_generation'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Начальное значение от времени, чтобы после вытеснения ключа
+        # не вернуться к поколению, под которым лежат старые фрагменты.
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def make_key(fragment_name, request):
+    parts = [
+        request.path,
+        request.GET.get('page', ''),
+        request.GET.get('cursor', ''),
+        str(get_generation()),
+    ]
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'feed_fragment.{fragment_name}.{digest}'
+
+
+def count_key(request):
+    """Ключ числа постов ленты: оно одно для всех страниц."""
+    parts = [request.path, str(get_generation())]
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'feed_count.{digest}'
+
+
+def record(hit):
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+    metrics.inc(
+        'yatube_fragment_cache_total', result='hit' if hit else 'miss'
+    )
+
+
+def stats():
+    """Счётчики попаданий и промахов кеша фрагментов в этом процессе."""
+    with _stats_lock:
+        return dict(_stats)
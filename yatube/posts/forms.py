@@ -1,5 +1,9 @@
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 
+from core.uploads import validate_image
+
+from . import thumbnails
 from .models import Post, Comment
 
 
@@ -13,6 +17,35 @@ class PostForm(ModelForm):
             'image': 'Картинка'
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Файлы, отклонённые ещё при приёме (core.uploads), превращаются
+        # в ошибки полей.
+        self.upload_errors = {}
+        if any(
+            hasattr(file, 'upload_error') for file in self.files.values()
+        ):
+            self.files = self.files.copy()
+            for name, file in list(self.files.items()):
+                if hasattr(file, 'upload_error'):
+                    self.upload_errors[name] = file.upload_error
+                    del self.files[name]
+
+    def clean_image(self):
+        if 'image' in self.upload_errors:
+            raise ValidationError(self.upload_errors['image'])
+        image = self.cleaned_data['image']
+        if image and 'image' in self.changed_data:
+            validate_image(image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit)
+        if commit and 'image' in self.changed_data and post.image:
+            # Миниатюры создаёт фоновый воркер, а не первый просмотр ленты.
+            thumbnails.enqueue(post.image.name)
+        return post
+
 
 class CommentForm(ModelForm):
     class Meta:
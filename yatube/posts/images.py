@@ -0,0 +1,121 @@
+"""Учёт ссылок на картинки постов и сборка мусора.
+
+Одинаковые картинки хранятся одним файлом (core.storage), и у копий
+общие миниатюры. Поэтому файл удаляется только тогда, когда на него
+больше не ссылается ни один пост: счётчик ImageBlob.refs меняется из
+сигналов Post, а после коммита файл без ссылок удаляется вместе с
+миниатюрами.
+"""
+import logging
+import posixpath
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .counters import count_of, increment
+from .models import ImageBlob, Post, ThumbnailTask, post_image_storage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_DIR = 'posts'
+
+
+def acquire(name, content=None):
+    """Добавляет ссылку на файл name.
+
+    content - загрузка, из которой файл только что сохранён. Хранилище
+    не пишет файл, который уже есть на диске, а collect() мог удалить
+    его вместе с ImageBlob до этой ссылки. Тогда файл пишется заново.
+    """
+    if not name:
+        return
+    if increment(ImageBlob.objects.filter(pk=name), refs=1):
+        return
+    ImageBlob.objects.get_or_create(name=name)
+    increment(ImageBlob.objects.filter(pk=name), refs=1)
+    if content is not None and not post_image_storage.exists(name):
+        content.seek(0)
+        directory = posixpath.dirname(posixpath.dirname(name))
+        post_image_storage.save(
+            posixpath.join(directory, posixpath.basename(name)), content
+        )
+
+
+def release(name):
+    if not name:
+        return
+    increment(ImageBlob.objects.filter(pk=name), refs=-1)
+    transaction.on_commit(lambda: collect([name]))
+
+
+def delete_file(name):
+    """Удаляет файл картинки, её миниатюры и задание очереди."""
+    try:
+        default.backend.delete(ImageFile(name, post_image_storage))
+    except (OSError, SuspiciousFileOperation):
+        logger.warning('Не удалось удалить картинку %s', name, exc_info=True)
+    ThumbnailTask.objects.filter(image=name).delete()
+
+
+def collect(names=None):
+    """Удаляет файлы без ссылок; names=None - все такие файлы."""
+    orphans = ImageBlob.objects.filter(refs__lte=0)
+    if names is not None:
+        orphans = orphans.filter(pk__in=names)
+    collected = 0
+    for name in list(orphans.values_list('pk', flat=True)):
+        # Пока файл ждал удаления, на него мог сослаться новый пост.
+        # Файл удаляется до коммита: acquire() этого же имени ждёт
+        # блокировку и уже не застанет файл, который вот-вот исчезнет.
+        with transaction.atomic():
+            if ImageBlob.objects.filter(pk=name, refs__lte=0).delete()[0]:
+                delete_file(name)
+                collected += 1
+    return collected
+
+
+def recount():
+    """Пересчитывает ссылки после массовых операций в обход сигналов."""
+    ImageBlob.objects.bulk_create(
+        [
+            ImageBlob(name=name)
+            for name in Post.objects.exclude(image='').values_list(
+                'image', flat=True
+            ).distinct()
+        ],
+        ignore_conflicts=True,
+    )
+    ImageBlob.objects.update(refs=count_of(Post.objects.all(), 'image'))
+
+
+def stored_images(path=IMAGE_DIR):
+    """Все файлы в хранилище картинок под path, включая подкаталоги."""
+    if not post_image_storage.exists(path):
+        return
+    directories, files = post_image_storage.listdir(path)
+    for filename in files:
+        yield f'{path}/{filename}'
+    for directory in directories:
+        yield from stored_images(f'{path}/{directory}')
+
+
+def sweep(min_age):
+    """Удаляет файлы, о которых не знает ни один пост.
+
+    Это остатки старых версий или прерванных загрузок. Свежие файлы
+    моложе min_age не трогаются: их пост может ещё сохраняться.
+    """
+    known = set(ImageBlob.objects.values_list('pk', flat=True))
+    deadline = timezone.now() - min_age
+    swept = 0
+    for name in list(stored_images()):
+        if name in known:
+            continue
+        if post_image_storage.get_modified_time(name) > deadline:
+            continue
+        delete_file(name)
+        swept += 1
+    return swept
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Ставит в очередь миниатюр все картинки из media/posts/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько картинок ставить в очередь за раз',
+        )
+        parser.add_argument(
+            '--requeue', action='store_true',
+            help='Заново обработать и уже готовые картинки',
+        )
+        parser.add_argument(
+            '--run', action='store_true',
+            help='Сразу обработать очередь (см. thumbnail_worker --once)',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help='Процессов для --run',
+        )
+
+    def handle(self, *args, **options):
+        count = 0
+        batch = []
+        for name in thumbnails.stored_images():
+            batch.append(name)
+            if len(batch) >= options['batch_size']:
+                thumbnails.enqueue(*batch, requeue=options['requeue'])
+                count += len(batch)
+                batch = []
+        thumbnails.enqueue(*batch, requeue=options['requeue'])
+        count += len(batch)
+        self.stdout.write(f'Поставлено в очередь: {count}')
+        if options['run']:
+            thumbnails.work(
+                processes=options['processes'],
+                once=True,
+                log=self.stdout.write,
+            )
@@ -0,0 +1,115 @@
+import json
+import os
+import subprocess
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment
+)
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон страниц на синтетических данных '
+        '(p50/p95/p99, запросов в секунду, SQL-запросов на запрос)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--groups', type=int, default=5)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--comments', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=benchmark.SCENARIOS,
+            help='Сценарий для прогона, можно несколько (по умолчанию все)',
+        )
+        parser.add_argument(
+            '--use-existing',
+            action='store_true',
+            help='Гонять на текущей базе без тестовой базы и наполнения',
+        )
+        parser.add_argument('--output', help='Куда сохранить отчёт в JSON')
+        parser.add_argument(
+            '--compare', help='Отчёт в JSON, с которым сравнить результат'
+        )
+
+    def handle(self, *args, **options):
+        if options['use_existing']:
+            report = self.run(options)
+        else:
+            setup_test_environment()
+            old_name = connection.settings_dict['NAME']
+            tmp_dir = tempfile.TemporaryDirectory()
+            if connection.vendor == 'sqlite':
+                # Файловая база вместо общей памяти: под нагрузкой SQLite
+                # ждёт блокировку, а не сразу падает с ошибкой.
+                connection.settings_dict['TEST']['NAME'] = os.path.join(
+                    tmp_dir.name, 'benchmark.sqlite3'
+                )
+            connection.creation.create_test_db(
+                verbosity=0, autoclobber=True, serialize=False
+            )
+            try:
+                benchmark.seed(
+                    users=options['users'],
+                    groups=options['groups'],
+                    posts=options['posts'],
+                    comments=options['comments'],
+                    follows=options['follows'],
+                    random_seed=options['seed'],
+                )
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+                tmp_dir.cleanup()
+        report['commit'] = self.commit()
+        self.print_report(report)
+        if options['compare']:
+            with open(options['compare']) as f:
+                for line in benchmark.compare(report, json.load(f)):
+                    self.stdout.write(line)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+
+    def run(self, options):
+        return benchmark.run(
+            scenarios=options['scenario'] or benchmark.SCENARIOS,
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            random_seed=options['seed'],
+        )
+
+    def commit(self):
+        try:
+            return subprocess.check_output(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                stderr=subprocess.DEVNULL,
+            ).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report):
+        self.stdout.write(
+            f'{report["requests"]} запросов за {report["elapsed"]:.2f} с, '
+            f'{report["rps"]:.1f} в секунду, '
+            f'потоков: {report["concurrency"]}'
+        )
+        for scenario, row in report['scenarios'].items():
+            self.stdout.write(
+                f'{scenario:14} p50 {row["p50_ms"]:7.1f} '
+                f'p95 {row["p95_ms"]:7.1f} p99 {row["p99_ms"]:7.1f} мс  '
+                f'{row["queries_per_request"]:5.1f} SQL/запрос  '
+                f'ошибок {row["errors"]}'
+            )
@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import images
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки и миниатюры, на которые не ссылаются посты'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки на картинки',
+        )
+        parser.add_argument(
+            '--sweep', action='store_true',
+            help='Удалить и файлы, которых нет в учёте ссылок',
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help='Не трогать при --sweep файлы моложе стольких часов',
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            images.recount()
+        self.stdout.write(f'Удалено картинок: {images.collect()}')
+        if options['sweep']:
+            swept = images.sweep(timedelta(hours=options['min_age']))
+            self.stdout.write(f'Удалено файлов вне учёта: {swept}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс полнотекстового поиска'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database',
+            default=DEFAULT_DB_ALIAS,
+            help='База, индекс которой пересобрать',
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        count = search.rebuild(using=using)
+        backend = 'FTS5' if search.use_fts(using) else 'SearchTerm'
+        self.stdout.write(f'Проиндексировано документов: {count} ({backend})')
@@ -0,0 +1,73 @@
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import seed
+
+
+class Command(BaseCommand):
+    help = 'Быстро наполняет базу синтетическими пользователями и постами'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--power', type=float, default=1.1,
+            help='Показатель степенного распределения популярности авторов',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--days', type=float, default=365,
+            help='За сколько дней до --until распределены посты',
+        )
+        parser.add_argument(
+            '--until', default=seed.UNTIL.date().isoformat(),
+            help='Дата последнего поста, ГГГГ-ММ-ДД (UTC)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не пересобирать ленты подписок после наполнения',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            until = datetime.fromisoformat(options['until'])
+        except ValueError:
+            raise CommandError(f'Неверная дата --until: {options["until"]}')
+        if timezone.is_naive(until):
+            until = timezone.make_aware(until, timezone.utc)
+        plan = seed.Plan(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows_per_user=options['follows_per_user'],
+            power=options['power'],
+            images=options['images'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            days=options['days'],
+            until=until,
+        )
+        seed.seed(plan, options['processes'], log=self.stdout.write)
+        seed.rebuild_derived(
+            timelines=not options['skip_timelines'], log=self.stdout.write
+        )
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - start:.1f} с'
+        )
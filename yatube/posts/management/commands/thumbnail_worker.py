@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Генерирует миниатюры картинок из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help='Сколько процессов генерируют миниатюры',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать очередь и выйти',
+        )
+
+    def handle(self, *args, **options):
+        thumbnails.work(
+            processes=options['processes'],
+            once=options['once'],
+            log=self.stdout.write,
+        )
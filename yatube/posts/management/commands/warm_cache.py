@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогревает кеш: первые страницы главной, крупные группы и '
+        'популярные профили'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.WARM_CACHE_PAGES,
+            help='Сколько первых страниц главной запросить',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=settings.WARM_CACHE_GROUPS,
+            help='Сколько групп с наибольшим числом постов',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=settings.WARM_CACHE_PROFILES,
+            help='Сколько профилей с наибольшим числом подписчиков',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.WARM_CACHE_WORKERS,
+            help='Сколько страниц запрашивать параллельно',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Процессов для генерации миниатюр',
+        )
+
+    def handle(self, *args, **options):
+        results = warmup.warm(
+            pages=options['pages'],
+            groups=options['groups'],
+            profiles=options['profiles'],
+            workers=options['workers'],
+            processes=options['processes'],
+            log=lambda line: self.stdout.write(f'миниатюры: {line}'),
+        )
+        for url, status, seconds in results:
+            self.stdout.write(f'{status} {seconds * 1000:7.1f} мс  {url}')
+        failed = sum(1 for _, status, _ in results if status != 200)
+        self.stdout.write(
+            f'Прогрето страниц: {len(results) - failed}, с ошибкой: {failed}'
+        )
@@ -0,0 +1,87 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from core import metrics
+
+from . import page_cache
+
+
+class PageCacheMiddleware:
+    """Отдаёт анонимам страницы PAGE_CACHE_VIEWS из кеша.
+
+    Страница запоминается целиком вместе с ETag (хеш содержимого) и
+    Last-Modified (время последнего изменения данных). Повторный запрос
+    с If-None-Match или If-Modified-Since получает 304 без рендеринга,
+    остальные - сохранённый ответ. Ответы с cookie не кешируются: в них
+    может быть что-то личное, например CSRF-токен.
+
+    Стоит после AuthenticationMiddleware: ей нужен request.user.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, 'page_cache_key', None)
+        if key is None or not self.cacheable(response):
+            return response
+        etag, last_modified = self.store(key, response)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            request.method not in ('GET', 'HEAD')
+            or request.user.is_authenticated
+            or request.resolver_match.view_name
+            not in settings.PAGE_CACHE_VIEWS
+        ):
+            return None
+        key = page_cache.make_key(request)
+        entry = cache.get(key)
+        if entry is None:
+            metrics.inc('yatube_page_cache_total', result='miss')
+            request.page_cache_key = key
+            return None
+        content, content_type, etag, last_modified = entry
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response,
+        )
+        metrics.inc(
+            'yatube_page_cache_total',
+            result='hit' if response.status_code == 200 else 'not_modified',
+        )
+        return response
+
+    @staticmethod
+    def cacheable(response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
+
+    def store(self, key, response):
+        etag = '"{}"'.format(hashlib.sha1(response.content).hexdigest())
+        last_modified = page_cache.last_modified()
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        cache.set(
+            key,
+            (response.content, response['Content-Type'], etag,
+             last_modified),
+            settings.PAGE_CACHE_TIMEOUT,
+        )
+        return etag, last_modified
@@ -0,0 +1,33 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailTask',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.CharField(max_length=255, unique=True, verbose_name='Картинка')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'В работе'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Миниатюры картинки',
+                'verbose_name_plural': 'Очередь миниатюр',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='thumbnailtask',
+            index=models.Index(fields=['status', 'created'], name='thumbnail_status_idx'),
+        ),
+    ]
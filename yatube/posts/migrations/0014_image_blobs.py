@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:14
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ImageBlob = apps.get_model('posts', 'ImageBlob')
+    ImageBlob.objects.bulk_create([
+        ImageBlob(name=row['image'], refs=row['refs'])
+        for row in Post.objects.exclude(image='').order_by()
+        .values('image').annotate(refs=Count('pk'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_thumbnail_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Файл')),
+                ('refs', models.IntegerField(default=0, verbose_name='Ссылок')),
+            ],
+            options={
+                'verbose_name': 'Файл картинки',
+                'verbose_name_plural': 'Файлы картинок',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:42
+
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.stemmer import stem
+
+FTS_TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+
+
+def terms(text):
+    return [stem(word)[:100] for word in WORD.findall(text.lower())]
+
+
+def fts_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def documents(apps, using):
+    """Тройки (документ, пост, текст), как в posts.search."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    posts = Post.objects.using(using).values_list('pk', 'text')
+    for pk, text in posts.iterator():
+        yield pk * 2, pk, text
+    comments = Comment.objects.using(using).values_list(
+        'pk', 'post_id', 'text'
+    )
+    for pk, post_id, text in comments.iterator():
+        yield pk * 2 + 1, post_id, text
+
+
+def batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def index_fts(connection, batch):
+    rows = []
+    for document, post_id, text in batch:
+        text = ' '.join(terms(text))
+        if document % 2 == 0:
+            rows.append((document, text, '', post_id))
+        else:
+            rows.append((document, '', text, post_id))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} '
+            '(rowid, post_text, comment_text, post_id) '
+            'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def index_terms(SearchTerm, using, batch):
+    entries = []
+    for document, post_id, text in batch:
+        words = terms(text)
+        for term, frequency in Counter(words).items():
+            entries.append(SearchTerm(
+                term=term, document=document, post_id=post_id,
+                frequency=frequency, length=len(words),
+            ))
+    SearchTerm.objects.using(using).bulk_create(entries)
+
+
+def create_index(apps, schema_editor):
+    """Индексирует уже написанные посты и комментарии.
+
+    Повторяет posts.search.rebuild() на исторических моделях.
+    """
+    connection = schema_editor.connection
+    available = fts_available(connection)
+    if available:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                'post_text, comment_text, post_id UNINDEXED)'
+            )
+            # rank - это bm25() с весами колонок; в отличие от bm25() его
+            # можно агрегировать.
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) "
+                "VALUES ('rank', 'bm25(2.0, 1.0)')"
+            )
+    use_fts = settings.SEARCH_BACKEND == 'fts5' or (
+        settings.SEARCH_BACKEND == 'auto' and available
+    )
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    rows = documents(apps, connection.alias)
+    for batch in batches(rows, settings.SEARCH_BATCH_SIZE):
+        if use_fts:
+            index_fts(connection, batch)
+        else:
+            index_terms(SearchTerm, connection.alias, batch)
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_image_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Основа слова')),
+                ('document', models.BigIntegerField(verbose_name='Документ')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Вхождений')),
+                ('length', models.PositiveIntegerField(verbose_name='Слов в документе')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово индекса поиска',
+                'verbose_name_plural': 'Индекс поиска',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['document'], name='search_document_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает посты по лентам подписок, созданным до 0011.
+
+    Повторяет posts.timeline.backfill() на исторических моделях:
+    последние TIMELINE_BACKFILL постов каждого автора из подписок, кроме
+    авторов, которых читают при запросе.
+    """
+    using = schema_editor.connection.alias
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    follows = Follow.objects.using(using)
+    celebrities = follows.values('author').annotate(
+        followers=Count('pk')
+    ).filter(
+        followers__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author', flat=True)
+    pairs = follows.exclude(author__in=list(celebrities)).values_list(
+        'user', 'author'
+    )
+    for user_id, author_id in pairs.iterator():
+        posts = Post.objects.using(using).filter(
+            author=author_id
+        ).order_by('-pub_date').values_list(
+            'pk', 'pub_date'
+        )[:settings.TIMELINE_BACKFILL]
+        TimelineEntry.objects.using(using).bulk_create(
+            [
+                TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+                for pk, pub_date in posts
+            ],
+            batch_size=settings.TIMELINE_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
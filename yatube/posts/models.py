@@ -1,15 +1,26 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
-from core.models import PubDateModel
+from core.models import CountersModel, PubDateModel
+from core.storage import ContentAddressedStorage
 
 User = get_user_model()
 
+# Одинаковые картинки постов хранятся одним файлом, см. posts.images.
+post_image_storage = ContentAddressedStorage()
+
+
+class Group(CountersModel):
+    counter_fields = ('posts_count',)
 
-class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.IntegerField(
+        verbose_name='Постов в группе',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -19,7 +30,9 @@ class Group(models.Model):
         return self.title
 
 
-class Post(PubDateModel):
+class Post(CountersModel, PubDateModel):
+    counter_fields = ('comments_count',)
+
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Введите текст поста'
@@ -42,13 +55,30 @@ class Post(PubDateModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    comments_count = models.IntegerField(
+        verbose_name='Комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'], name='post_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date'], name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'], name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -77,6 +107,11 @@ class Comment(PubDateModel):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'pub_date'], name='comment_post_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:10]
@@ -105,3 +140,150 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        # Пара (user, author) уже покрыта индексом unique_follow.
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.IntegerField(verbose_name='Постов', default=0)
+    followers_count = models.IntegerField(
+        verbose_name='Подписчиков', default=0
+    )
+    following_count = models.IntegerField(verbose_name='Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    # Копия Post.pub_date: лента сортируется по индексу этой таблицы.
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'pub_date'], name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+
+class ThumbnailTask(models.Model):
+    """Задание очереди на генерацию миниатюр одной картинки."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'В работе'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    image = models.CharField(
+        verbose_name='Картинка', max_length=255, unique=True
+    )
+    status = models.CharField(
+        verbose_name='Статус', max_length=10, choices=STATUSES,
+        default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(
+        verbose_name='Попыток', default=0
+    )
+    error = models.TextField(verbose_name='Ошибка', blank=True)
+    created = models.DateTimeField(verbose_name='Создано', auto_now_add=True)
+    updated = models.DateTimeField(verbose_name='Обновлено', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Миниатюры картинки'
+        verbose_name_plural = 'Очередь миниатюр'
+        indexes = [
+            models.Index(
+                fields=['status', 'created'], name='thumbnail_status_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.image
+
+
+class ImageBlob(models.Model):
+    """Файл картинки и число постов, которые на него ссылаются."""
+    name = models.CharField(
+        verbose_name='Файл', max_length=255, primary_key=True
+    )
+    refs = models.IntegerField(verbose_name='Ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return self.name
+
+
+class SearchTerm(models.Model):
+    """Запись обратного индекса поиска, если в SQLite нет FTS5.
+
+    См. posts.search: document - номер документа (поста или
+    комментария), frequency - сколько раз основа слова в нём встречается,
+    length - сколько всего слов в документе.
+    """
+    term = models.CharField(verbose_name='Основа слова', max_length=100)
+    document = models.BigIntegerField(verbose_name='Документ')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост',
+    )
+    frequency = models.PositiveIntegerField(verbose_name='Вхождений')
+    length = models.PositiveIntegerField(verbose_name='Слов в документе')
+
+    class Meta:
+        verbose_name = 'Слово индекса поиска'
+        verbose_name_plural = 'Индекс поиска'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['term', 'document'],
+                name='unique_search_term'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['document'], name='search_document_idx'),
+        ]
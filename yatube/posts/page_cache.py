@@ -0,0 +1,51 @@
+"""Кеш целых страниц для анонимных посетителей.
+
+Как и у фрагментов лент (feed_cache), ключ страницы включает поколение,
+которое сигналы увеличивают при любом изменении постов, комментариев,
+групп, подписок и пользователей. Вместе с поколением запоминается время
+изменения: оно отдаётся в Last-Modified.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = 'page_generation'
+MODIFIED_KEY = 'page_modified'
+
+
+def get_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    # Время пишется до incr(): incr() сбрасывает L1 других процессов,
+    # и они перечитают оба ключа.
+    cache.set(MODIFIED_KEY, time.time(), None)
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def last_modified():
+    """Время последнего изменения страниц, секунды от эпохи.
+
+    После сброса кеша оно неизвестно, и отсчёт начинается заново:
+    лучше отдать страницу лишний раз, чем ответить 304 на устаревшую.
+    """
+    modified = cache.get(MODIFIED_KEY)
+    if modified is None:
+        cache.add(MODIFIED_KEY, time.time(), None)
+        modified = cache.get(MODIFIED_KEY)
+    return int(modified)
+
+
+def make_key(request):
+    parts = [request.get_full_path(), str(get_generation())]
+    digest = hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return f'page.{digest}'
@@ -0,0 +1,298 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Тексты разбиваются на слова, а слова приводятся к основе русским
+стеммером (core.stemmer), поэтому запрос "котами" находит "кота".
+Индекс хранится в базе и обновляется сигналами при сохранении и
+удалении постов и комментариев:
+
+* в виртуальной таблице FTS5 posts_search, если SQLite собран с FTS5;
+  результаты ранжирует сама SQLite (BM25);
+* иначе в обратном индексе SearchTerm, который ранжируется здесь же
+  по той же формуле.
+
+У каждого поста и каждого комментария в индексе свой документ. Пост
+находится, если все слова запроса есть в нём самом или в одном из его
+комментариев; совпадение в тексте поста весит вдвое больше.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from django.db.models import Count
+
+from core import metrics
+from core.stemmer import stem
+
+from .models import Comment, Post, SearchTerm
+
+FTS_TABLE = 'posts_search'
+POST_WEIGHT = 2.0
+# Параметры BM25 те же, что у FTS5.
+K1 = 1.2
+B = 0.75
+
+WORD = re.compile(r'\w+')
+# Служебные слова есть почти в каждом тексте: в запросе они ничего не
+# отбирают, а только заставляют читать огромные списки документов.
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'вот', 'все', 'всё', 'вы', 'да', 'для', 'до', 'его', 'ее',
+    'её', 'ей', 'если', 'есть', 'еще', 'ещё', 'же', 'за', 'и', 'из',
+    'или', 'им', 'их', 'к', 'как', 'ли', 'мне', 'мы', 'на', 'над', 'не',
+    'нет', 'ни', 'но', 'о', 'об', 'он', 'она', 'они', 'оно', 'от', 'по',
+    'под', 'при', 'с', 'со', 'так', 'там', 'то', 'тоже', 'только', 'ты',
+    'у', 'уже', 'что', 'чтобы', 'это', 'я',
+))
+
+_fts_tables = {}
+
+
+def terms(text, stop_words=()):
+    """Основы слов текста в порядке появления, кроме stop_words."""
+    # Длина основы ограничена длиной SearchTerm.term.
+    return [
+        stem(word)[:100] for word in WORD.findall(text.lower())
+        if word not in stop_words
+    ]
+
+
+def post_document(pk):
+    return pk * 2
+
+
+def comment_document(pk):
+    return pk * 2 + 1
+
+
+def is_post_document(document):
+    return document % 2 == 0
+
+
+def fts_available(connection):
+    """Собрана ли SQLite, с которой работает connection, с FTS5."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return ('ENABLE_FTS5',) in cursor.fetchall()
+
+
+def use_fts(using):
+    """Работает ли индекс базы using через FTS5 (см. SEARCH_BACKEND)."""
+    if settings.SEARCH_BACKEND != 'auto':
+        return settings.SEARCH_BACKEND == 'fts5'
+    connection = connections[using]
+    key = (using, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        _fts_tables[key] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _fts_tables[key]
+
+
+def index(documents, using=DEFAULT_DB_ALIAS):
+    """Добавляет или заменяет документы (document, post_id, text)."""
+    documents = list(documents)
+    if not documents:
+        return
+    if use_fts(using):
+        _index_fts(connections[using], documents)
+    else:
+        _index_terms(using, documents)
+
+
+def _index_fts(connection, documents):
+    rows = []
+    for document, post_id, text in documents:
+        text = ' '.join(terms(text))
+        if is_post_document(document):
+            rows.append((document, text, '', post_id))
+        else:
+            rows.append((document, '', text, post_id))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} '
+            '(rowid, post_text, comment_text, post_id) '
+            'VALUES (%s, %s, %s, %s)',
+            rows,
+        )
+
+
+def _index_terms(using, documents):
+    entries = []
+    for document, post_id, text in documents:
+        words = terms(text)
+        for term, frequency in Counter(words).items():
+            entries.append(SearchTerm(
+                term=term, document=document, post_id=post_id,
+                frequency=frequency, length=len(words),
+            ))
+    with transaction.atomic(using):
+        remove([document for document, _, _ in documents], using)
+        SearchTerm.objects.using(using).bulk_create(
+            entries, batch_size=settings.SEARCH_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def remove(documents, using=DEFAULT_DB_ALIAS):
+    """Убирает документы из индекса."""
+    if not documents:
+        return
+    if use_fts(using):
+        with connections[using].cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(document,) for document in documents],
+            )
+    else:
+        SearchTerm.objects.using(using).filter(
+            document__in=documents
+        ).delete()
+
+
+def index_post(post):
+    index(
+        [(post_document(post.pk), post.pk, post.text)],
+        post._state.db or DEFAULT_DB_ALIAS,
+    )
+
+
+def index_comment(comment):
+    index(
+        [(comment_document(comment.pk), comment.post_id, comment.text)],
+        comment._state.db or DEFAULT_DB_ALIAS,
+    )
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def rebuild(posts=None, comments=None, using=DEFAULT_DB_ALIAS):
+    """Собирает индекс заново; возвращает число документов.
+
+    posts - пары (pk, text), comments - тройки (pk, post_id, text); по
+    умолчанию все посты и комментарии базы.
+    """
+    if posts is None:
+        posts = Post.objects.using(using).values_list('pk', 'text')
+    if comments is None:
+        comments = Comment.objects.using(using).values_list(
+            'pk', 'post_id', 'text'
+        )
+    documents = [
+        ((post_document(pk), pk, text) for pk, text in posts.iterator()),
+        (
+            (comment_document(pk), post_id, text)
+            for pk, post_id, text in comments.iterator()
+        ),
+    ]
+    count = 0
+    with transaction.atomic(using):
+        if use_fts(using):
+            with connections[using].cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        else:
+            SearchTerm.objects.using(using).all().delete()
+        for rows in documents:
+            for batch in _batches(rows, settings.SEARCH_BATCH_SIZE):
+                index(batch, using)
+                count += len(batch)
+    return count
+
+
+def search(query, limit=None):
+    """id постов, подходящих под запрос, от лучших к худшим.
+
+    Стоп-слова (STOP_WORDS) в запросе не учитываются.
+    """
+    words = list(dict.fromkeys(terms(query, STOP_WORDS)))
+    if not words:
+        return []
+    using = router.db_for_read(Post)
+    fts = use_fts(using)
+    started = time.perf_counter()
+    if fts:
+        posts = _search_fts(connections[using], words, limit)
+    else:
+        posts = _search_terms(using, words, limit)
+    metrics.observe(
+        'yatube_search_duration_seconds', time.perf_counter() - started,
+        backend='fts5' if fts else 'python',
+    )
+    return posts
+
+
+def _search_fts(connection, words, limit):
+    # Каждое слово в кавычках: так оно не разбирается как оператор FTS5.
+    match = ' '.join(f'"{word}"' for word in words)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT post_id, MIN(rank) AS score FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s GROUP BY post_id '
+            'ORDER BY score, post_id DESC LIMIT %s',
+            [match, -1 if limit is None else limit],
+        )
+        return [post_id for post_id, _ in cursor.fetchall()]
+
+
+def _search_terms(using, words, limit):
+    index = SearchTerm.objects.using(using).filter(term__in=words)
+    frequencies = dict(
+        index.order_by().values_list('term').annotate(Count('pk'))
+    )
+    if len(frequencies) < len(words):
+        return []
+    # Документы со всеми словами запроса отбирает база, и в память
+    # читаются только их вхождения. Если слова очень частые, ранжируются
+    # SEARCH_MAX_CANDIDATES самых новых документов.
+    documents = index.order_by().values('document').annotate(
+        found=Count('pk')
+    ).filter(found=len(words)).order_by('-document').values(
+        'document'
+    )[:settings.SEARCH_MAX_CANDIDATES]
+    postings = index.filter(document__in=documents).values_list(
+        'term', 'document', 'post', 'frequency', 'length'
+    )
+    matched = {}
+    for term, document, post_id, frequency, length in postings:
+        matched.setdefault(document, (post_id, length, {}))[2][term] = (
+            frequency
+        )
+    if not matched:
+        return []
+    total = (
+        Post.objects.using(using).count()
+        + Comment.objects.using(using).count()
+    )
+    # Средняя длина документа берётся по найденным: общей по индексу
+    # SearchTerm не хранит.
+    average = sum(length for _, length, _ in matched.values()) / len(matched)
+    scores = {}
+    for document, (post_id, length, found) in matched.items():
+        score = 0.0
+        for term, frequency in found.items():
+            idf = math.log(
+                (total - frequencies[term] + 0.5)
+                / (frequencies[term] + 0.5) + 1
+            )
+            score += idf * frequency * (K1 + 1) / (
+                frequency + K1 * (1 - B + B * length / max(average, 1))
+            )
+        if is_post_document(document):
+            score *= POST_WEIGHT
+        scores[post_id] = max(score, scores.get(post_id, 0.0))
+    ranked = sorted(scores, key=lambda post_id: (-scores[post_id], -post_id))
+    return ranked if limit is None else ranked[:limit]
@@ -0,0 +1,293 @@
+"""Быстрое наполнение базы синтетическими данными.
+
+Данные создаются через bulk_create пачками. Первичные ключи
+пользователей и постов назначаются заранее, поэтому пачки независимы:
+их можно раздать нескольким процессам, а результат зависит только от
+seed, но не от числа процессов. Подписки строятся по степенному закону:
+немногие авторы собирают большинство подписчиков.
+
+Даты публикации тоже выводятся из seed: посты равномерно, со случайным
+сдвигом, занимают days дней до момента until, а комментарии появляются
+вскоре после своих постов.
+"""
+import io
+import random
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from multiprocessing import Pool
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections
+from django.db.models import Max
+from faker import Faker
+
+from . import counters, feed_cache, images, timeline
+from .models import Comment, Follow, Group, Post, post_image_storage
+
+User = get_user_model()
+
+PASSWORD = 'yatube-seed'
+SENTENCES = 500
+IMAGES = 16
+# Конец синтетической истории по умолчанию. Он постоянный: с текущим
+# временем один и тот же seed давал бы разные даты.
+UNTIL = datetime(2024, 1, 1, tzinfo=timezone.utc)
+# Средняя задержка комментария после публикации поста, в секундах.
+COMMENT_DELAY = 6 * 60 * 60
+
+
+class Plan:
+    """Параметры прогона и диапазоны ключей, общие для всех процессов."""
+
+    def __init__(self, users, groups, posts, comments, follows_per_user,
+                 power, images, batch_size, seed, days=365, until=UNTIL):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows_per_user = follows_per_user
+        self.power = power
+        self.images = images
+        self.batch_size = batch_size
+        self.seed = seed
+        self.until = until
+        self.span = timedelta(days=days).total_seconds()
+        self.user_base = User.objects.aggregate(m=Max('pk'))['m'] or 0
+        self.post_base = Post.objects.aggregate(m=Max('pk'))['m'] or 0
+        self.password = make_password(PASSWORD)
+        self.group_ids = []
+        self.image_names = []
+
+    def chunks(self, total):
+        for index, start in enumerate(range(0, total, self.batch_size)):
+            yield index, start, min(self.batch_size, total - start)
+
+    def random(self, phase, index):
+        return random.Random(f'{self.seed}:{phase}:{index}')
+
+    def moment(self, seconds):
+        """Момент через seconds секунд от начала истории, не позже until."""
+        return self.until - timedelta(seconds=max(self.span - seconds, 0))
+
+    @property
+    def post_interval(self):
+        """Секунд истории на один пост."""
+        return self.span / max(self.posts, 1)
+
+    def sentences(self):
+        fake = Faker('ru_RU')
+        fake.seed_instance(self.seed)
+        return [fake.sentence(nb_words=10) for _ in range(SENTENCES)]
+
+
+def _text(rnd, sentences, low, high):
+    return ' '.join(rnd.choices(sentences, k=rnd.randint(low, high)))
+
+
+@contextmanager
+def _explicit_pub_date(model):
+    """Даёт bulk_create сохранить заданный pub_date.
+
+    Иначе auto_now_add заменил бы его текущим временем.
+    """
+    field = model._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def create_users(plan, index, start, count):
+    User.objects.bulk_create([
+        User(
+            pk=plan.user_base + start + i + 1,
+            username=f'seed{plan.seed}_{start + i}',
+            first_name=f'Автор{start + i}',
+            password=plan.password,
+        )
+        for i in range(count)
+    ])
+
+
+def create_posts(plan, index, start, count):
+    rnd = plan.random('posts', index)
+    sentences = plan.sentences()
+    groups = plan.group_ids + [None]
+    posts = []
+    for i in range(count):
+        image = ''
+        if plan.image_names and rnd.random() < plan.images:
+            image = rnd.choice(plan.image_names)
+        posts.append(Post(
+            pk=plan.post_base + start + i + 1,
+            author_id=plan.user_base + rnd.randint(1, plan.users),
+            group_id=rnd.choice(groups),
+            text=_text(rnd, sentences, 1, 8),
+            image=image,
+            # Пост номер n публикуется в n-м промежутке post_interval.
+            pub_date=plan.moment(
+                plan.post_interval * (start + i + rnd.random())
+            ),
+        ))
+    with _explicit_pub_date(Post):
+        Post.objects.bulk_create(posts)
+
+
+def create_comments(plan, index, start, count):
+    rnd = plan.random('comments', index)
+    sentences = plan.sentences()
+    comments = []
+    for _ in range(count):
+        number = rnd.randint(1, plan.posts)
+        comments.append(Comment(
+            post_id=plan.post_base + number,
+            author_id=plan.user_base + rnd.randint(1, plan.users),
+            text=_text(rnd, sentences, 1, 2),
+            # После конца промежутка поста, то есть позже самого поста.
+            pub_date=plan.moment(
+                plan.post_interval * number
+                + rnd.expovariate(1 / COMMENT_DELAY)
+            ),
+        ))
+    with _explicit_pub_date(Comment):
+        Comment.objects.bulk_create(comments)
+
+
+@lru_cache(maxsize=4)
+def _cum_weights(users, power):
+    """Накопленные веса: вес автора с номером k равен 1 / k ** power."""
+    weights = []
+    total = 0.0
+    for rank in range(1, users + 1):
+        total += 1 / rank ** power
+        weights.append(total)
+    return weights
+
+
+def create_follows(plan, index, start, count):
+    rnd = plan.random('follows', index)
+    weights = _cum_weights(plan.users, plan.power)
+    authors = range(plan.user_base + 1, plan.user_base + plan.users + 1)
+    follows = []
+    for i in range(count):
+        user_id = plan.user_base + start + i + 1
+        # Среднее paretovariate(1.2) равно 6.
+        wanted = min(
+            int(rnd.paretovariate(1.2) * plan.follows_per_user / 6),
+            plan.users - 1,
+        )
+        chosen = set(rnd.choices(authors, cum_weights=weights, k=wanted))
+        chosen.discard(user_id)
+        follows.extend(
+            Follow(user_id=user_id, author_id=author_id)
+            for author_id in sorted(chosen)
+        )
+    Follow.objects.bulk_create(follows, ignore_conflicts=True)
+
+
+PHASES = (
+    ('users', create_users, 'users'),
+    ('posts', create_posts, 'posts'),
+    ('comments', create_comments, 'comments'),
+    ('follows', create_follows, 'users'),
+)
+
+
+def _init_worker():
+    if not django.apps.apps.ready:
+        django.setup()
+    # Соединения родителя нельзя делить с дочерним процессом.
+    connections.close_all()
+
+
+def _run_chunk(args):
+    function, plan, index, start, count = args
+    function(plan, index, start, count)
+    return count
+
+
+def create_images(plan):
+    """Несколько общих картинок, на которые ссылаются посты."""
+    from PIL import Image
+
+    rnd = plan.random('images', 0)
+    names = []
+    for i in range(IMAGES):
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (960, 540), color).save(buffer, 'JPEG')
+        # Хранилище адресует файлы по содержимому: повтор не создаст копию.
+        names.append(
+            post_image_storage.save(f'posts/seed_{plan.seed}_{i}.jpg', buffer)
+        )
+    return names
+
+
+def seed(plan, processes=1, log=None):
+    """Наполняет базу по плану, раздавая пачки processes процессам."""
+    groups = [
+        Group(
+            title=f'Группа {plan.seed}-{i}',
+            slug=f'seed-{plan.seed}-{i}',
+            description='Синтетическая группа',
+        )
+        for i in range(plan.groups)
+    ]
+    Group.objects.bulk_create(groups)
+    plan.group_ids = list(
+        Group.objects.filter(
+            slug__startswith=f'seed-{plan.seed}-'
+        ).values_list('pk', flat=True)
+    )
+    if plan.images:
+        plan.image_names = create_images(plan)
+    pool = None
+    if processes > 1:
+        connections.close_all()
+        pool = Pool(processes, initializer=_init_worker)
+    try:
+        for phase, function, size in PHASES:
+            tasks = [
+                (function, plan, index, start, count)
+                for index, start, count in plan.chunks(getattr(plan, size))
+            ]
+            if pool is None:
+                done = sum(map(_run_chunk, tasks))
+            else:
+                done = sum(pool.imap_unordered(_run_chunk, tasks))
+            if log:
+                log(f'{phase}: {done}')
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    reset_sequences()
+
+
+def reset_sequences():
+    """Сдвигает автоинкремент после вставки явных ключей (PostgreSQL)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post, Comment, Follow]
+    )
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def rebuild_derived(timelines=True, log=None):
+    """bulk_create обходит сигналы: пересчитываем производные данные."""
+    counters.recount()
+    images.recount()
+    if log:
+        log('counters: ok')
+    if timelines:
+        users = User.objects.filter(follower__isnull=False).distinct()
+        timeline.rebuild(users.iterator())
+        if log:
+            log('timelines: ok')
+    feed_cache.bump_generation()
@@ -0,0 +1,162 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters, feed_cache, images, page_cache, search, timeline
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+# Счётчики подключаются первыми: лента читает followers_count.
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group', 'image'
+            ).first() or (None, '')
+        )
+    # Файл ещё не записан; загрузка понадобится images.acquire().
+    if not raw and instance.image and not instance.image._committed:
+        instance._image_upload = instance.image.file
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.increment_user(instance.author_id, posts_count=1)
+        counters.increment_group(instance.group_id, 1)
+        return
+    saved_group_id = getattr(instance, '_saved_group_id', instance.group_id)
+    if saved_group_id != instance.group_id:
+        counters.increment_group(saved_group_id, -1)
+        counters.increment_group(instance.group_id, 1)
+        instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    counters.decrement_user(instance.author_id, posts_count=-1)
+    counters.increment_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Post)
+def count_image(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    name = instance.image.name or ''
+    saved = '' if created else getattr(instance, '_saved_image', name)
+    upload = instance.__dict__.pop('_image_upload', None)
+    if saved != name:
+        images.acquire(name, upload)
+        images.release(saved)
+        instance._saved_image = name
+
+
+@receiver(post_delete, sender=Post)
+def release_image(sender, instance, **kwargs):
+    images.release(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    counters.increment_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.increment_user(instance.author_id, followers_count=1)
+        counters.increment_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    counters.decrement_user(instance.author_id, followers_count=-1)
+    counters.decrement_user(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_timeline(sender, instance, **kwargs):
+    timeline.trim(instance.user_id, instance.author_id)
+    followers = Follow.objects.filter(author=instance.author_id).count()
+    if followers == settings.TIMELINE_FANOUT_LIMIT:
+        # Автор только что перестал читаться при запросе.
+        timeline.backfill_followers(instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields and 'text' not in update_fields):
+        return
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    if raw or (update_fields and 'text' not in update_fields):
+        return
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove([search.post_document(instance.pk)])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove([search.comment_document(instance.pk)])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_feeds(sender, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login, ленты от него
+    # не меняются.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    feed_cache.bump_generation()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_pages(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    page_cache.bump_generation()
@@ -0,0 +1,41 @@
+from django import template
+from django.conf import settings
+
+from core import stampede
+from posts import feed_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+
+    def render(self, context):
+        key = feed_cache.make_key(self.fragment_name, context['request'])
+        rendered = []
+
+        def render():
+            rendered.append(True)
+            return self.nodelist.render(context)
+
+        content = stampede.fetch(key, render, settings.FEED_CACHE_TIMEOUT)
+        feed_cache.record(not rendered)
+        return content
+
+
+@register.tag('feedcache')
+def do_feedcache(parser, token):
+    """Кеширует фрагмент ленты до следующего изменения постов.
+
+        {% feedcache index_page %} ... {% endfeedcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает только имя фрагмента"
+        )
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, bits[1])
@@ -0,0 +1,23 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(image, preset='card'):
+    """<picture> с готовыми миниатюрами или заглушка того же размера.
+
+        {% post_image post.image %}
+    """
+    geometry = settings.THUMBNAIL_PRESETS[preset][0]
+    width, height = geometry.split('x')
+    return {
+        'image': image,
+        'picture': thumbnails.picture(image, preset) if image else None,
+        'placeholder': settings.THUMBNAIL_PLACEHOLDER,
+        'width': width,
+        'height': height,
+    }
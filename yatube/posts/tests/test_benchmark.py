@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import skipUnless
+
+import pytest
+from django.conf import settings
+from django.test import TransactionTestCase
+
+from .. import benchmark
+
+
+class BenchmarkTest(TransactionTestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(benchmark.percentile(values, 50), 50)
+        self.assertEqual(benchmark.percentile(values, 99), 99)
+        self.assertEqual(benchmark.percentile([], 95), 0.0)
+
+    def test_smoke_run(self):
+        """Короткий прогон проходит все сценарии без ошибок."""
+        benchmark.seed(users=3, groups=1, posts=5, comments=5, follows=2)
+        # Тестовая база SQLite в памяти общая для потоков: параллельные
+        # записи ловят "table is locked", поэтому здесь один поток.
+        report = benchmark.run(requests=14, concurrency=1)
+        self.assertEqual(report['requests'], 14)
+        for scenario, row in report['scenarios'].items():
+            with self.subTest(scenario=scenario):
+                self.assertEqual(row['errors'], 0)
+                self.assertGreater(row['queries_per_request'], 0)
+
+    @pytest.mark.benchmark
+    @skipUnless(os.environ.get('BENCHMARK'), 'BENCHMARK=1 для полного прогона')
+    def test_full_run(self):
+        """Полный прогон в 8 потоков проходит без ошибок.
+
+        Прогон идёт командой benchmark в отдельном процессе: она создаёт
+        файловую базу, где SQLite под нагрузкой ждёт блокировку, а не
+        падает, как общая база тестов в памяти. Отчёт сохраняется в
+        BENCHMARK_REPORT.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = os.environ.get(
+                'BENCHMARK_REPORT', os.path.join(directory, 'report.json')
+            )
+            subprocess.run(
+                [
+                    sys.executable, 'manage.py', 'benchmark',
+                    '--requests', '800', '--concurrency', '8',
+                    '--output', report_path,
+                ],
+                cwd=settings.BASE_DIR,
+                env={
+                    **os.environ,
+                    'CACHE_LOCATION': os.path.join(directory, 'cache.sqlite3'),
+                },
+                stdout=subprocess.DEVNULL,
+                check=True,
+            )
+            with open(report_path) as f:
+                report = json.load(f)
+        self.assertEqual(report['requests'], 800)
+        for scenario, row in report['scenarios'].items():
+            with self.subTest(scenario=scenario):
+                self.assertGreater(row['requests'], 0)
+                self.assertEqual(row['errors'], 0)
@@ -1,14 +1,20 @@
 from django.core.cache import cache
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse_lazy
 
 
-from posts.models import Post
+from posts import feed_cache
+from posts.models import Comment, Post
 
 User = get_user_model()
 
 
+# Кеш фрагментов проверяется без кеша страниц, который отдал бы
+# повторный ответ целиком.
+@override_settings(PAGE_CACHE_VIEWS=())
 class PostTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -19,19 +25,102 @@ class PostTests(TestCase):
             author=cls.user,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_cache(self):
+        """Повторный запрос отдаёт фрагмент из кеша."""
         request1 = self.client.get(reverse_lazy('posts:index'))
-        PostTests.post.delete()
+        before = feed_cache.stats()
         request2 = self.client.get(reverse_lazy('posts:index'))
+        after = feed_cache.stats()
         self.assertHTMLEqual(
             str(request1.content),
             str(request2.content),
             'Ошибка кэширования'
         )
+        self.assertEqual(after['hits'], before['hits'] + 1)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_cache_invalidated_on_change(self):
+        """Удаление поста сразу сбрасывает кеш ленты."""
+        request1 = self.client.get(reverse_lazy('posts:index'))
+        self.assertContains(request1, PostTests.post.text)
+        PostTests.post.delete()
+        request2 = self.client.get(reverse_lazy('posts:index'))
+        self.assertNotContains(request2, PostTests.post.text)
+
+    def test_cache_is_page_aware(self):
+        """У каждой страницы свой фрагмент."""
+        for i in range(10):
+            Post.objects.create(text=f'Пост {i}', author=PostTests.user)
+        request1 = self.client.get(reverse_lazy('posts:index'))
+        request2 = self.client.get(reverse_lazy('posts:index') + '?page=2')
+        self.assertNotContains(request1, PostTests.post.text)
+        self.assertContains(request2, PostTests.post.text)
+
+    def test_page_count_is_cached(self):
+        """COUNT(*) ленты считается один раз на поколение."""
+        for i in range(10):
+            Post.objects.create(text=f'Пост {i}', author=PostTests.user)
+        url = reverse_lazy('posts:index') + '?page=2'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse_lazy('posts:index') + '?page=1')
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+        Post.objects.create(text='Новый пост', author=PostTests.user)
+        response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='Author')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
         cache.clear()
-        request3 = self.client.get(reverse_lazy('posts:index'))
-        self.assertHTMLNotEqual(
-            str(request1.content),
-            str(request3.content),
-            'Ошибка кэширования'
+
+    def test_anonymous_page_is_cached(self):
+        url = reverse_lazy('posts:index')
+        first = self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(url)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertEqual(first['Last-Modified'], second['Last-Modified'])
+
+    def test_conditional_get(self):
+        url = reverse_lazy('posts:index')
+        first = self.client.get(url)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_comment_invalidates_page(self):
+        url = reverse_lazy(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
         )
+        first = self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новый комментарий')
+
+    def test_authenticated_user_is_not_served_from_cache(self):
+        url = reverse_lazy('posts:index')
+        self.client.get(url)
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+        self.assertFalse(response.has_header('ETag'))
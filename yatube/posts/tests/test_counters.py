@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.other_group = Group.objects.create(title='Другая', slug='other')
+
+    def test_delete_user(self):
+        """Удаление автора не создаёт заново счётчики удаляемых."""
+        author = User.objects.create_user(username='leaving')
+        post = Post.objects.create(author=author, text='Пост')
+        Comment.objects.create(post=post, author=author, text='!')
+        Comment.objects.create(post=post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=author)
+        Follow.objects.create(user=author, author=self.author)
+        author.delete()
+        connection.check_constraints()
+        self.assertFalse(UserStats.objects.filter(user=author.pk).exists())
+        self.assertCounters()
+
+    def assertCounters(self):
+        """Счётчики совпадают с честным COUNT(*)."""
+        for user in (self.author, self.reader):
+            stats = UserStats.objects.get(user=user)
+            self.assertEqual(stats.posts_count, user.posts.count())
+            self.assertEqual(stats.followers_count, user.following.count())
+            self.assertEqual(stats.following_count, user.follower.count())
+        for group in Group.objects.all():
+            self.assertEqual(group.posts_count, group.posts.count())
+        for post in Post.objects.all():
+            self.assertEqual(post.comments_count, post.comments.count())
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании, правке и удалении."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Post.objects.create(author=self.author, text='Без группы')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='!'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertCounters()
+        post.group = self.other_group
+        post.save()
+        self.assertCounters()
+        comment.delete()
+        Follow.objects.all().delete()
+        post.delete()
+        self.assertCounters()
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Comment.objects.create(post=post, author=self.reader, text='!')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.update(
+            posts_count=42, followers_count=-1, following_count=7
+        )
+        Group.objects.update(posts_count=100)
+        Post.objects.update(comments_count=0)
+        call_command('recount', stdout=StringIO())
+        self.assertCounters()
+
+    def test_profile_shows_counters_without_count_query(self):
+        """Профиль берёт число постов из счётчика."""
+        Post.objects.create(author=self.author, text='Пост')
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/profile/{self.author.username}/')
+        self.assertContains(response, 'Всего постов: 1')
@@ -124,7 +124,7 @@ class CreateFormTest(TestCase):
             data=form_data,
             follow=True
         )
-        last_comment = response.context['comments'].order_by('-pub_date')[0]
+        last_comment = response.context['comments'][0]
         self.assertRedirects(
             response,
             reverse_lazy(
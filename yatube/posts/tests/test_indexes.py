@@ -0,0 +1,71 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TABLES = (
+    'posts_post', 'posts_comment', 'posts_follow', 'posts_timelineentry'
+)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class FeedIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+        Comment.objects.create(post=cls.post, author=cls.reader, text='!')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(FeedIndexTest.reader)
+
+    def assert_indexed(self, url):
+        """Каждый запрос к таблицам posts идёт по индексу."""
+        with CaptureQueriesContext(connection) as queries:
+            self.reader_client.get(url)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or not any(
+                table in sql for table in TABLES
+            ):
+                continue
+            with connection.cursor() as cursor:
+                # В captured_queries параметры уже подставлены в текст.
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            with self.subTest(url=url, sql=sql):
+                for step in plan:
+                    self.assertNotIn('TEMP B-TREE', step)
+                    if any(table in step for table in TABLES):
+                        self.assertIn('USING', step)
+
+    def test_feeds_use_indexes(self):
+        """Ленты идут по индексам и без сортировки во временном дереве."""
+        urls = [
+            reverse_lazy('posts:index'),
+            reverse_lazy('posts:index') + '?page=1',
+            reverse_lazy('posts:group_list', kwargs={'slug': 'group'}),
+            reverse_lazy('posts:profile', kwargs={'username': 'author'}),
+            reverse_lazy(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+            reverse_lazy('posts:follow_index'),
+        ]
+        for url in urls:
+            self.assert_indexed(url)
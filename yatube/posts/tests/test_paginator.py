@@ -0,0 +1,152 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from ..models import Comment, Group, Post
+from ..utils import CursorPage, decode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor')
+        cls.group = Group.objects.create(title='Курсор', slug='cursor')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(settings.MAX_AMOUNT * 2 + 3)
+        ]
+        # Одинаковая дата у всех постов проверяет разбор по id.
+        Post.objects.update(pub_date=cls.posts[0].pub_date)
+
+    def walk(self, url):
+        """Проходит ленту по ссылкам next_cursor и собирает id постов."""
+        ids = []
+        response = self.client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            self.assertIsInstance(page_obj, CursorPage)
+            ids.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                return ids, page_obj
+            response = self.client.get(
+                url, {'cursor': page_obj.next_cursor}
+            )
+
+    def test_cursor_walks_whole_feed(self):
+        """Курсор обходит всю ленту без пропусков и повторов."""
+        ids, last_page = self.walk(reverse_lazy('posts:index'))
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(last_page), 3)
+        self.assertTrue(last_page.has_previous())
+
+    def test_previous_cursor(self):
+        """Курсор назад возвращает предыдущую страницу."""
+        url = reverse_lazy(
+            'posts:profile', kwargs={'username': self.user.username}
+        )
+        first = self.client.get(url).context['page_obj']
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            url, {'cursor': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'cursor': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_no_count_query(self):
+        """Курсорная страница не выполняет COUNT(*)."""
+        url = reverse_lazy('posts:group_list', kwargs={'slug': 'cursor'})
+        cursor = self.client.get(url).context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'cursor': cursor})
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        """Битый курсор открывает первую страницу."""
+        self.assertIsNone(decode_cursor('мусор'))
+        response = self.client.get(
+            reverse_lazy('posts:index'), {'cursor': 'bm90LWEtY3Vyc29y'}
+        )
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+
+@override_settings(COMMENTS_PER_PAGE=5, PAGE_CACHE_VIEWS=())
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+            for i in range(13)
+        ]
+        Comment.objects.update(pub_date=cls.comments[0].pub_date)
+        cls.detail_url = reverse_lazy(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.more_url = reverse_lazy(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def walk(self, order=None):
+        """Первая порция со страницы поста, остальные - из фрагментов."""
+        params = {'order': order} if order else {}
+        response = self.client.get(self.detail_url, params)
+        ids = []
+        while True:
+            comments = response.context['comments']
+            self.assertLessEqual(len(comments), 5)
+            ids.extend(comment.pk for comment in comments)
+            if not comments.has_next():
+                self.assertNotContains(response, 'Показать ещё')
+                return ids
+            self.assertContains(response, 'Показать ещё')
+            response = self.client.get(
+                self.more_url, {**params, 'cursor': comments.next_cursor}
+            )
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_newest_first(self):
+        """По умолчанию комментарии идут от новых к старым."""
+        ids = [comment.pk for comment in reversed(self.comments)]
+        self.assertEqual(self.walk(), ids)
+
+    def test_oldest_first(self):
+        """С order=oldest - от старых к новым."""
+        ids = [comment.pk for comment in self.comments]
+        self.assertEqual(self.walk('oldest'), ids)
+
+    def test_detail_page_renders_first_batch_only(self):
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Комментарий 12')
+        self.assertContains(response, 'Комментарий 8')
+        self.assertNotContains(response, 'Комментарий 7')
+
+    def test_missing_post(self):
+        response = self.client.get(
+            reverse_lazy('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse_lazy
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryCountTest(TestCase):
+    """Число запросов страницы не растёт вместе с числом записей на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = cls.create_post(cls.author)
+
+    @classmethod
+    def create_post(cls, author):
+        return Post.objects.create(author=author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(QueryCountTest.reader)
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(url)
+        return len(queries), response
+
+    def test_feeds(self):
+        """Ленты: запросы не зависят от числа постов и авторов."""
+        urls = [
+            reverse_lazy('posts:index'),
+            reverse_lazy('posts:index') + '?page=1',
+            reverse_lazy('posts:group_list', kwargs={'slug': 'group'}),
+            reverse_lazy('posts:profile', kwargs={'username': 'author'}),
+            reverse_lazy('posts:follow_index'),
+        ]
+        single = {url: self.count_queries(url)[0] for url in urls}
+        for i in range(9):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            self.create_post(author)
+            self.create_post(self.author)
+        for url in urls:
+            with self.subTest(url=url):
+                count, response = self.count_queries(url)
+                self.assertGreater(len(response.context['page_obj']), 1)
+                self.assertEqual(count, single[url])
+
+    def test_post_detail(self):
+        """Комментарии загружаются вместе с авторами."""
+        url = reverse_lazy(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        single = self.count_queries(url)[0]
+        for i in range(9):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=self.post, author=author, text='!')
+        self.assertEqual(self.count_queries(url)[0], single)
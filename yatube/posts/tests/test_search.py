@@ -0,0 +1,129 @@
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Post, SearchTerm
+
+User = get_user_model()
+
+
+class SearchTestsMixin:
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.cats = Post.objects.create(
+            text='Коты любят рыбу', author=self.author
+        )
+        self.dogs = Post.objects.create(
+            text='Собака грызёт кость', author=self.author
+        )
+
+    def test_finds_word_forms(self):
+        self.assertEqual(search.search('котами'), [self.cats.pk])
+        self.assertEqual(search.search('СОБАКИ'), [self.dogs.pk])
+        self.assertEqual(search.search('коты собака'), [])
+        self.assertEqual(search.search('!!! "*'), [])
+
+    def test_stop_words_are_ignored(self):
+        self.assertEqual(search.search('и коты, а не'), [self.cats.pk])
+        self.assertEqual(search.search('а не то'), [])
+
+    def test_comment_matches_rank_below_post_text(self):
+        Comment.objects.create(
+            post=self.dogs, author=self.author, text='А моя рыба молчит'
+        )
+        self.assertEqual(search.search('рыба'), [self.cats.pk, self.dogs.pk])
+
+    def test_index_follows_changes(self):
+        comment = Comment.objects.create(
+            post=self.dogs, author=self.author, text='Хомяк'
+        )
+        self.cats.text = 'Попугаи поют'
+        self.cats.save()
+        self.assertEqual(search.search('коты'), [])
+        self.assertEqual(search.search('попугай'), [self.cats.pk])
+        comment.delete()
+        self.assertEqual(search.search('хомяки'), [])
+        self.dogs.delete()
+        self.assertEqual(search.search('кость'), [])
+
+    def test_rebuild_command(self):
+        Comment.objects.create(
+            post=self.dogs, author=self.author, text='Хомяк'
+        )
+        search.remove([
+            search.post_document(self.cats.pk),
+            search.post_document(self.dogs.pk),
+        ])
+        self.assertEqual(search.search('рыба'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Проиндексировано документов: 3', out.getvalue())
+        self.assertEqual(search.search('рыба'), [self.cats.pk])
+        self.assertEqual(search.search('хомяк'), [self.dogs.pk])
+
+    def test_migration_indexes_existing_posts(self):
+        Comment.objects.create(
+            post=self.dogs, author=self.author, text='Хомяк'
+        )
+        search.rebuild(Post.objects.none(), Comment.objects.none())
+        self.assertEqual(search.search('рыба'), [])
+        # Таблицу FTS5 миграция уже создала; повторное создание внутри
+        # откатываемой транзакции теста портит её для остальных тестов.
+        migration = import_module('posts.migrations.0015_search')
+        documents = list(migration.documents(apps, 'default'))
+        if search.use_fts('default'):
+            migration.index_fts(connection, documents)
+        else:
+            migration.index_terms(
+                apps.get_model('posts', 'SearchTerm'), 'default', documents
+            )
+        self.assertEqual(search.search('рыба'), [self.cats.pk])
+        self.assertEqual(search.search('хомяк'), [self.dogs.pk])
+
+
+class FTSSearchTest(SearchTestsMixin, TestCase):
+    def test_uses_fts(self):
+        self.assertTrue(search.fts_available(connection))
+        self.assertTrue(search.use_fts('default'))
+        self.assertFalse(SearchTerm.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='python')
+class TermsSearchTest(SearchTestsMixin, TestCase):
+    def test_uses_terms(self):
+        self.assertTrue(
+            SearchTerm.objects.filter(term='кот', post=self.cats).exists()
+        )
+
+    @override_settings(SEARCH_MAX_CANDIDATES=1)
+    def test_common_words_rank_newest_documents(self):
+        fish = Post.objects.create(text='Рыба плывёт', author=self.author)
+        self.assertEqual(search.search('рыба'), [fish.pk])
+
+
+@override_settings(MAX_AMOUNT=2)
+class SearchViewTest(TestCase):
+    def test_search_page(self):
+        author = User.objects.create_user(username='author')
+        posts = [
+            Post.objects.create(text=f'Пост номер {i}', author=author)
+            for i in range(3)
+        ]
+        response = self.client.get(reverse('posts:search'), {'q': 'посты'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 2)
+        query = '%D0%BF%D0%BE%D1%81%D1%82%D1%8B'
+        self.assertContains(response, f'?q={query}&page=2')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'номер 1', 'page': 1}
+        )
+        self.assertEqual(list(response.context['page_obj']), [posts[1]])
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
@@ -0,0 +1,72 @@
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class SeedTest(TestCase):
+    def seed(self, **options):
+        call_command(
+            'seed_yatube', users=20, groups=3, posts=100, comments=50,
+            follows_per_user=4, images=0, batch_size=30, seed=7,
+            stdout=StringIO(), **options
+        )
+
+    def snapshot(self):
+        posts = list(
+            Post.objects.order_by('pk').values_list(
+                'author__username', 'text', 'pub_date'
+            )
+        )
+        comments = list(
+            Comment.objects.order_by('pk').values_list('text', 'pub_date')
+        )
+        follows = set(
+            Follow.objects.values_list('user__username', 'author__username')
+        )
+        return posts, comments, follows
+
+    def test_seed_creates_data(self):
+        """Команда создаёт объекты и пересчитывает производные данные."""
+        self.seed()
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 50
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+    def test_seed_is_deterministic(self):
+        """Одинаковый seed даёт одинаковые данные."""
+        self.seed(skip_timelines=True)
+        first = self.snapshot()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(skip_timelines=True)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_seed_spreads_pub_dates(self):
+        """Даты постов распределены по периоду, комментарии позже постов."""
+        self.seed(skip_timelines=True, days=30, until='2023-06-01')
+        until = datetime(2023, 6, 1, tzinfo=timezone.utc)
+        dates = list(
+            Post.objects.order_by('pk').values_list('pub_date', flat=True)
+        )
+        self.assertEqual(dates, sorted(dates))
+        self.assertLessEqual(dates[-1], until)
+        self.assertGreater((dates[-1] - dates[0]).days, 25)
+        self.assertFalse(
+            Comment.objects.filter(pub_date__lt=F('post__pub_date')).exists()
+        )
+        self.assertFalse(Comment.objects.filter(pub_date__gt=until).exists())
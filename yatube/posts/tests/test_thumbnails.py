@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from .. import thumbnails
+from ..models import Post, ThumbnailTask, post_image_storage
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='photo.jpg'):
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), (200, 100, 50)).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_PATH=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class ThumbnailQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище ключей миниатюр лежит в TEMP_MEDIA_ROOT и удаляется с ним.
+        default.kvstore.close()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.client.force_login(self.user)
+
+    def test_upload_is_queued_and_rendered_after_worker(self):
+        """Страница показывает заглушку, пока воркер не создал миниатюру."""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'С картинкой', 'image': make_image()},
+        )
+        post = Post.objects.get()
+        task = ThumbnailTask.objects.get()
+        self.assertEqual(task.image, post.image.name)
+        self.assertEqual(task.status, ThumbnailTask.PENDING)
+        url = reverse('posts:post_detail', args=[post.pk])
+        self.assertContains(
+            self.client.get(url), settings.THUMBNAIL_PLACEHOLDER
+        )
+
+        self.assertEqual(thumbnails.process(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, ThumbnailTask.DONE)
+        picture = thumbnails.picture(post.image, 'card')
+        self.assertEqual((picture['width'], picture['height']), (960, 339))
+        response = self.client.get(url)
+        self.assertContains(response, picture['src'])
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertNotContains(response, settings.THUMBNAIL_PLACEHOLDER)
+
+    def test_cached_pages_show_thumbnail_after_worker(self):
+        """Кеш ленты и страниц сбрасывается, когда миниатюры готовы."""
+        cache.clear()
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'С картинкой', 'image': make_image()},
+        )
+        post = Post.objects.get()
+        guest = Client()
+        url = reverse('posts:index')
+        self.assertContains(guest.get(url), settings.THUMBNAIL_PLACEHOLDER)
+        self.assertContains(
+            self.client.get(url), settings.THUMBNAIL_PLACEHOLDER
+        )
+
+        thumbnails.process()
+        src = thumbnails.picture(post.image, 'card')['src']
+        for client in (guest, self.client):
+            with self.subTest(authenticated=client is self.client):
+                response = client.get(url)
+                self.assertContains(response, src)
+                self.assertNotContains(
+                    response, settings.THUMBNAIL_PLACEHOLDER
+                )
+
+    def test_all_variants_are_generated(self):
+        """Воркер создаёт каждую ширину в каждом доступном формате."""
+        name = post_image_storage.save('posts/photo.jpg', make_image())
+        thumbnails.generate(name)
+        variants = thumbnails.variants('card')
+        self.assertEqual(
+            len(variants),
+            len(thumbnails.formats()) * (len(settings.THUMBNAIL_WIDTHS) + 1),
+        )
+        for format_, width, height, options in variants:
+            with self.subTest(format=format_, width=width):
+                thumbnail = default.backend.get_ready_thumbnail(
+                    ImageFile(name, post_image_storage),
+                    f'{width}x{height}',
+                    **options
+                )
+                self.assertEqual((thumbnail.width, thumbnail.height),
+                                 (width, height))
+                with default.storage.open(thumbnail.name) as file:
+                    self.assertEqual(Image.open(file).format, format_)
+
+    def test_missing_file_fails_after_retries(self):
+        """Задание с пропавшим файлом повторяется и помечается ошибкой."""
+        thumbnails.enqueue('posts/missing.jpg')
+        for _ in range(settings.THUMBNAIL_QUEUE_RETRIES):
+            self.assertEqual(thumbnails.process(), 1)
+        task = ThumbnailTask.objects.get()
+        self.assertEqual(task.status, ThumbnailTask.FAILED)
+        self.assertIn('FileNotFoundError', task.error)
+        self.assertEqual(thumbnails.process(), 0)
+
+    def test_backfill_queues_stored_images(self):
+        """backfill_thumbnails ставит в очередь картинки из media/posts/."""
+        # Файлы со старыми именами, до хранилища по содержимому.
+        default_storage.save('posts/old.jpg', make_image())
+        default_storage.save('posts/2020/older.jpg', make_image())
+        default_storage.save('posts/notes.txt', StringIO('не картинка'))
+        call_command('backfill_thumbnails', stdout=StringIO())
+        call_command('backfill_thumbnails', stdout=StringIO())
+        self.assertEqual(
+            set(ThumbnailTask.objects.values_list('image', flat=True)),
+            {'posts/old.jpg', 'posts/2020/older.jpg'},
+        )
@@ -0,0 +1,80 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import get_timeline
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def test_follow_backfills_timeline(self):
+        """Подписка добавляет в ленту уже опубликованные посты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(list(get_timeline(self.reader)), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            list(get_timeline(self.reader)), [post, self.old_post]
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.author))
+
+    def test_unfollow_trims_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(get_timeline(self.reader).exists())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_read_on_demand(self):
+        """Посты популярных авторов подмешиваются при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            list(get_timeline(self.reader)), [post, self.old_post]
+        )
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_timelines', stdout=out)
+        self.assertIn('1', out.getvalue())
+        self.assertEqual(list(get_timeline(self.reader)), [self.old_post])
+
+    def test_rebuild_clears_unfollowed_timeline(self):
+        """Лента без подписок очищается от старых записей."""
+        TimelineEntry.objects.create(
+            user=self.reader, post=self.old_post,
+            pub_date=self.old_post.pub_date,
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_migration_fills_timelines(self):
+        """Миграция раскладывает посты по уже существующим подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        migration = import_module('posts.migrations.0016_fill_timelines')
+        migration.fill_timelines(apps, SimpleNamespace(connection=connection))
+        self.assertEqual(list(get_timeline(self.reader)), [self.old_post])
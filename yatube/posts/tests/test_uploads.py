@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from core.uploads import ImageUploadHandler
+
+from ..models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_bytes(size=(40, 30), format_='PNG', mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size).save(buffer, format_)
+    return buffer.getvalue()
+
+
+def noise_png(size):
+    """Несжимаемая картинка: PNG-файл не меньше 3 байт на пиксель."""
+    buffer = BytesIO()
+    pixels = os.urandom(size[0] * size[1] * 3)
+    Image.frombytes('RGB', size, pixels).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_PATH=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class UploadValidationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def upload(self, content, name='image.png'):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Пост',
+            'image': SimpleUploadedFile(name, content, 'image/png'),
+        })
+
+    def test_valid_image_is_accepted(self):
+        response = self.upload(image_bytes())
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Post.objects.get().image)
+
+    def test_rejected_uploads_show_form_error(self):
+        """Неподходящий файл даёт ошибку формы, пост не создаётся."""
+        cases = {
+            'байты': (noise_png((200, 200)), 'Файл больше'),
+            # 100 Мп однобитной картинки сжимаются в несколько килобайт.
+            'пиксели': (
+                image_bytes((10000, 10000), mode='1'), 'мегапикселей'
+            ),
+            'формат': (image_bytes(format_='BMP'), 'не поддерживается'),
+            'не картинка': (b'not an image' * 10, 'правильное изображение'),
+        }
+        for case, (content, error) in cases.items():
+            with self.subTest(case=case), self.settings(
+                UPLOAD_IMAGE_MAX_BYTES=64 * 1024
+            ):
+                response = self.upload(content)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(
+                    error, response.context['form'].errors['image'][0]
+                )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(UPLOAD_IMAGE_MAX_BYTES=100 * 1024)
+    def test_handler_stops_buffering_oversized_file(self):
+        """После превышения лимита чанки не передаются дальше."""
+        handler = ImageUploadHandler()
+        handler.new_file('image', 'big.png', 'image/png', None)
+        data = noise_png((200, 200))
+        size = 64 * 1024
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        passed = [handler.receive_data_chunk(chunk, 0) for chunk in chunks]
+        self.assertEqual(passed[0], chunks[0])
+        self.assertEqual(passed[1:], [None] * (len(chunks) - 1))
+        rejected = handler.file_complete(len(data))
+        self.assertIn('Файл больше', rejected.upload_error)
@@ -4,7 +4,7 @@ import shutil
 
 from django import forms
 from django.conf import settings
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse_lazy
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -29,6 +29,7 @@ UPLOADED_GIF = SimpleUploadedFile(
 )
 
 
+@override_settings(PAGE_CACHE_VIEWS=())
 class PostsPagesTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import feed_cache
+from ..models import Group, Post, ThumbnailTask
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), (50, 100, 200)).save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_KVSTORE_PATH=os.path.join(TEMP_MEDIA_ROOT, 'kvstore.sqlite3'),
+)
+class WarmCacheTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        default.kvstore.close()
+        cache.clear()
+        author = User.objects.create_user(username='author')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.post = Post.objects.create(
+            text='С картинкой', author=author, group=group,
+            image=make_image(),
+        )
+        Post.objects.create(text='Без картинки', author=author)
+
+    def test_warms_pages_and_thumbnails(self):
+        unrelated = ThumbnailTask.objects.create(image='posts/00/other.jpg')
+        out = StringIO()
+        call_command('warm_cache', workers=1, stdout=out)
+        output = out.getvalue()
+        for url in ('/', '/group/group/', '/profile/author/'):
+            self.assertIn(f'  {url}\n', output)
+        self.assertIn('Прогрето страниц: 3, с ошибкой: 0', output)
+        task = ThumbnailTask.objects.get(image=self.post.image.name)
+        self.assertEqual(task.status, ThumbnailTask.DONE)
+        unrelated.refresh_from_db()
+        self.assertEqual(unrelated.status, ThumbnailTask.PENDING)
+
+        # Аноним получает прогретую страницу целиком из кеша страниц.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(len(queries), 0)
+        self.assertContains(response, 'type="image/webp"')
+        # Остальным достаётся прогретый фрагмент ленты.
+        self.client.force_login(self.post.author)
+        before = feed_cache.stats()
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(feed_cache.stats()['hits'], before['hits'] + 1)
+        self.assertContains(response, 'type="image/webp"')
@@ -0,0 +1,238 @@
+"""Фоновая генерация миниатюр картинок постов.
+
+Формы ставят картинку в очередь - таблицу ThumbnailTask, поэтому
+задания переживают перезапуск. Воркер забирает их пачками и раздаёт
+пулу процессов, которые создают миниатюры всех пресетов из
+THUMBNAIL_PRESETS: каждую ширину из THUMBNAIL_WIDTHS в каждом формате
+из THUMBNAIL_FORMATS, который умеет сохранять Pillow. Пока миниатюра
+не готова, шаблоны показывают заглушку и не декодируют оригинал
+внутри запроса.
+"""
+import time
+from datetime import timedelta
+from multiprocessing import Pool
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from . import feed_cache, images, page_cache
+from .models import ThumbnailTask, post_image_storage
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+
+def enqueue(*names, requeue=False):
+    """Ставит картинки в очередь.
+
+    Уже известные картинки пропускаются, а с requeue=True обрабатываются
+    заново - например, после смены форматов или ширин.
+    """
+    names = [name for name in names if name]
+    if requeue:
+        ThumbnailTask.objects.filter(image__in=names).update(
+            status=ThumbnailTask.PENDING, attempts=0, error='',
+            updated=timezone.now(),
+        )
+    ThumbnailTask.objects.bulk_create(
+        [ThumbnailTask(image=name) for name in names],
+        ignore_conflicts=True,
+    )
+
+
+def formats():
+    """Форматы из THUMBNAIL_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        (format_, quality)
+        for format_, quality in settings.THUMBNAIL_FORMATS.items()
+        if format_ in Image.SAVE
+    ]
+
+
+def variants(preset):
+    """Миниатюры пресета: (формат, ширина, высота, опции sorl).
+
+    Последней идёт самая широкая миниатюра основного формата: воркер
+    создаёт её последней, поэтому по ней шаблон судит о готовности.
+    """
+    geometry, options = settings.THUMBNAIL_PRESETS[preset]
+    full_width, full_height = map(int, geometry.split('x'))
+    widths = sorted(
+        {width for width in settings.THUMBNAIL_WIDTHS if width < full_width}
+    ) + [full_width]
+    return [
+        (
+            format_,
+            width,
+            round(full_height * width / full_width),
+            dict(options, format=format_, quality=quality),
+        )
+        for format_, quality in formats()
+        for width in widths
+    ]
+
+
+def _url(image, width, height, options):
+    name = default.backend.get_thumbnail_name(
+        image, f'{width}x{height}', **options
+    )
+    return default.storage.url(name)
+
+
+def picture(image, preset):
+    """Источники для <picture> или None, если миниатюры ещё нет."""
+    items = variants(preset)
+    main_format, width, height, options = items[-1]
+    if not default.backend.get_ready_thumbnail(
+        image, f'{width}x{height}', **options
+    ):
+        return None
+    srcsets = {}
+    for format_, item_width, item_height, item_options in items:
+        url = _url(image, item_width, item_height, item_options)
+        srcsets.setdefault(format_, []).append(f'{url} {item_width}w')
+    main_srcset = srcsets.pop(main_format)
+    return {
+        'sources': [
+            {
+                'type': Image.MIME.get(format_, f'image/{format_.lower()}'),
+                'srcset': ', '.join(srcset),
+            }
+            for format_, srcset in srcsets.items()
+        ],
+        'srcset': ', '.join(main_srcset),
+        'src': _url(image, width, height, options),
+        'width': width,
+        'height': height,
+        'sizes': settings.THUMBNAIL_SIZES,
+    }
+
+
+def generate(name):
+    """Создаёт все миниатюры всех пресетов для одной картинки."""
+    if not post_image_storage.exists(name):
+        # sorl-thumbnail молча вернёт пустую миниатюру: это ошибка задания.
+        raise FileNotFoundError(name)
+    # Ключ миниатюры зависит от хранилища: оно должно совпадать с Post.image.
+    source = ImageFile(name, post_image_storage)
+    for preset in settings.THUMBNAIL_PRESETS:
+        for format_, width, height, options in variants(preset):
+            get_thumbnail(source, f'{width}x{height}', **options)
+
+
+def claim(limit, names=None):
+    """Забирает до limit заданий так, что воркеры не делят их между собой.
+
+    names ограничивает выбор заданиями этих картинок.
+    """
+    now = timezone.now()
+    # Задания упавшего воркера возвращаются в очередь.
+    ThumbnailTask.objects.filter(
+        status=ThumbnailTask.RUNNING,
+        updated__lt=now - timedelta(seconds=settings.THUMBNAIL_QUEUE_STALE),
+    ).update(status=ThumbnailTask.PENDING)
+    candidates = ThumbnailTask.objects.filter(status=ThumbnailTask.PENDING)
+    if names is not None:
+        candidates = candidates.filter(image__in=names)
+    candidates = candidates.order_by('created').values_list(
+        'pk', flat=True
+    )[:limit]
+    claimed = [
+        pk for pk in list(candidates)
+        if ThumbnailTask.objects.filter(
+            pk=pk, status=ThumbnailTask.PENDING
+        ).update(
+            status=ThumbnailTask.RUNNING,
+            attempts=F('attempts') + 1,
+            updated=now,
+        )
+    ]
+    return list(ThumbnailTask.objects.filter(pk__in=claimed))
+
+
+def finish(task, error=''):
+    if not error:
+        status = ThumbnailTask.DONE
+    elif task.attempts >= settings.THUMBNAIL_QUEUE_RETRIES:
+        status = ThumbnailTask.FAILED
+    else:
+        status = ThumbnailTask.PENDING
+    ThumbnailTask.objects.filter(pk=task.pk).update(
+        status=status, error=error, updated=timezone.now()
+    )
+
+
+def _init_worker():
+    if not django.apps.apps.ready:
+        django.setup()
+    # Соединения родителя нельзя делить с дочерним процессом.
+    connections.close_all()
+
+
+def _run_task(args):
+    pk, name = args
+    try:
+        generate(name)
+    except Exception as error:
+        return pk, f'{type(error).__name__}: {error}'
+    return pk, ''
+
+
+def process(pool=None, limit=None, names=None):
+    """Обрабатывает одну пачку заданий и возвращает её размер."""
+    tasks = {
+        task.pk: task
+        for task in claim(limit or settings.THUMBNAIL_QUEUE_BATCH, names)
+    }
+    jobs = [(task.pk, task.image) for task in tasks.values()]
+    results = map(_run_task, jobs) if pool is None else (
+        pool.imap_unordered(_run_task, jobs)
+    )
+    ready = 0
+    for pk, error in results:
+        finish(tasks[pk], error)
+        ready += not error
+    if ready:
+        # Ленты и страницы в кеше отрисованы с заглушкой вместо готовых
+        # миниатюр: одно новое поколение на пачку сбрасывает их.
+        feed_cache.bump_generation()
+        page_cache.bump_generation()
+    return len(tasks)
+
+
+def work(processes=1, once=False, log=None, names=None):
+    """Цикл воркера; с once=True выходит, когда очередь опустела.
+
+    С names обрабатываются только задания этих картинок.
+    """
+    pool = None
+    if processes > 1:
+        connections.close_all()
+        pool = Pool(processes, initializer=_init_worker)
+    try:
+        while True:
+            done = process(pool, names=names)
+            if done and log:
+                log(f'обработано: {done}')
+            if not done:
+                if once:
+                    break
+                time.sleep(settings.THUMBNAIL_QUEUE_POLL)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+def stored_images():
+    """Картинки из хранилища постов, включая подкаталоги."""
+    return (
+        name for name in images.stored_images()
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
@@ -0,0 +1,112 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается по лентам подписчиков автора при сохранении,
+подписка добавляет в ленту последние посты автора, отписка их убирает.
+Посты авторов, у которых подписчиков больше TIMELINE_FANOUT_LIMIT,
+не раскладываются, а подмешиваются в ленту при чтении.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_celebrity(author_id):
+    return UserStats.objects.filter(
+        user=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def celebrity_authors(user):
+    """Авторы из подписок пользователя, которых читают при запросе."""
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('author', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id
+    ).values_list('user', flat=True)
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты автора."""
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(author=author_id).order_by(
+        '-pub_date'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    TimelineEntry.objects.filter(
+        user=user_id, post__author=author_id
+    ).delete()
+
+
+def backfill_followers(author_id):
+    """Раскладывает посты автора всем подписчикам.
+
+    Нужно, когда автор перестаёт читаться при запросе: его старые посты
+    в ленты подписчиков не попадали.
+    """
+    followers = Follow.objects.filter(
+        author=author_id
+    ).values_list('user', flat=True)
+    for user_id in followers:
+        backfill(user_id, author_id)
+
+
+def rebuild(users):
+    """Пересобирает ленты пользователей с нуля.
+
+    Лента каждого пользователя пересобирается в одной транзакции, чтобы
+    читатели не увидели её наполовину пустой.
+    """
+    for user in users:
+        with transaction.atomic():
+            TimelineEntry.objects.filter(user=user).delete()
+            authors = Follow.objects.filter(
+                user=user
+            ).values_list('author', flat=True)
+            for author_id in authors:
+                backfill(user.pk, author_id)
+
+
+def get_timeline(user):
+    """Посты ленты подписок пользователя от новых к старым."""
+    celebrities = celebrity_authors(user)
+    if not celebrities:
+        return Post.objects.filter(
+            timeline_entries__user=user
+        ).order_by('-timeline_entries__pub_date')
+    return Post.objects.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    )
@@ -1,9 +1,170 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
+from django.core.paginator import Page, Paginator
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from core import stampede
+
+from . import feed_cache
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, post):
+    """Упаковывает позицию (pub_date, id) в непрозрачный токен."""
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (direction, pub_date, id) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации без номера и общего количества."""
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    @property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(NEXT, self[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(PREVIOUS, self[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (pub_date, id): постов, комментариев.
+
+    В отличие от Paginator не выполняет COUNT(*) и OFFSET: каждая
+    страница выбирается условием по ключу последней записи предыдущей.
+    По умолчанию листает от новых записей к старым, с oldest_first -
+    от старых к новым.
+    """
+
+    def __init__(self, object_list, per_page, oldest_first=False, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.oldest_first = oldest_first
+
+    def _check_object_list_is_ordered(self):
+        # Порядок задаёт сам пагинатор в _build_page().
+        pass
+
+    def _to_older(self, direction):
+        return (direction == NEXT) != self.oldest_first
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor)
+        if position is None:
+            return self._build_page(self.object_list, NEXT, False)
+        direction, pub_date, pk = position
+        if self._to_older(direction):
+            rows = self.object_list.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+            )
+        else:
+            rows = self.object_list.filter(
+                Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+            )
+        return self._build_page(rows, direction, True)
+
+    def page(self, number):
+        return self.get_page(number)
+
+    def _build_page(self, rows, direction, has_cursor):
+        if self._to_older(direction):
+            rows = rows.order_by('-pub_date', '-pk')
+        else:
+            rows = rows.order_by('pub_date', 'pk')
+        rows = list(rows[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return CursorPage(rows, self, has_more, has_cursor)
+        rows.reverse()
+        return CursorPage(rows, self, has_cursor, has_more)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт COUNT(*) ленты из кеша.
+
+    Число постов общее для всех страниц ленты и сбрасывается вместе
+    с её фрагментами при смене поколения лент.
+    """
+
+    def __init__(self, object_list, per_page, count_key):
+        super().__init__(object_list, per_page)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        return stampede.fetch(
+            self.count_key,
+            self.object_list.count,
+            settings.FEED_CACHE_TIMEOUT,
+        )
 
 
 def get_page_content(posts, request):
-    paginator = Paginator(posts, settings.MAX_AMOUNT)
+    view_name = getattr(request.resolver_match, 'view_name', None)
+    if (
+        view_name in settings.CURSOR_PAGINATION_VIEWS
+        and 'page' not in request.GET
+    ):
+        paginator = CursorPaginator(posts, settings.MAX_AMOUNT)
+        return paginator.get_page(request.GET.get('cursor'))
+    if view_name in settings.CURSOR_PAGINATION_VIEWS:
+        # Публичные ленты одинаковы для всех, а лента подписок - нет.
+        paginator = CachedCountPaginator(
+            posts, settings.MAX_AMOUNT, feed_cache.count_key(request)
+        )
+    else:
+        paginator = Paginator(posts, settings.MAX_AMOUNT)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def get_comments_page(comments, request):
+    """Порция комментариев после курсора ?cursor= в порядке ?order=."""
+    paginator = CursorPaginator(
+        comments,
+        settings.COMMENTS_PER_PAGE,
+        oldest_first=request.GET.get('order') == 'oldest',
+    )
+    return paginator.get_page(request.GET.get('cursor'))
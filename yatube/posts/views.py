@@ -1,13 +1,25 @@
+from django.conf import settings
+from django.core.paginator import Paginator
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 
-from .models import Post, Group, User, Comment, Follow
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from .utils import get_page_content
+from .search import search as search_posts
+from .timeline import get_timeline
+from .utils import get_comments_page, get_page_content
+
+# Поля, которые выводят шаблоны лент: остальные колонки не загружаются.
+POST_FIELDS = ('text', 'pub_date', 'image', 'author', 'group')
+AUTHOR_FIELDS = ('author__username', 'author__first_name', 'author__last_name')
+GROUP_FIELDS = ('group__title', 'group__slug')
+COMMENT_FIELDS = ('text', 'pub_date', 'post', 'author__username')
 
 
 def index(request):
-    posts = Post.objects.select_related('group').all()
+    posts = Post.objects.select_related('author', 'group').only(
+        *POST_FIELDS, *AUTHOR_FIELDS, *GROUP_FIELDS
+    )
     context = {
         'page_obj': get_page_content(posts, request)
     }
@@ -16,7 +28,9 @@ def index(request):
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author').only(
+        *POST_FIELDS, *AUTHOR_FIELDS
+    )
     context = {
         'page_obj': get_page_content(posts, request),
         'group': group
@@ -25,8 +39,12 @@ def group_posts(request, slug):
 
 
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=author)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.select_related('group').only(
+        *POST_FIELDS, *GROUP_FIELDS
+    )
     following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user, author=author).exists()
     context = {
@@ -38,13 +56,50 @@ def profile(request, username):
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post_id)
+    comments = post.comments.select_related('author').only(*COMMENT_FIELDS)
     return render(
         request,
         'posts/post_detail.html',
-        {'post': post, 'form': form, 'comments': comments}
+        {
+            'post': post,
+            'form': form,
+            'comments': get_comments_page(comments, request),
+        }
+    )
+
+
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки "Показать ещё"."""
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = Comment.objects.filter(post=post).select_related(
+        'author'
+    ).only(*COMMENT_FIELDS)
+    return render(
+        request,
+        'posts/includes/comment_list.html',
+        {'post_id': post.pk, 'comments': get_comments_page(comments, request)}
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    found = search_posts(query, settings.SEARCH_MAX_RESULTS) if query else []
+    page_obj = Paginator(found, settings.MAX_AMOUNT).get_page(
+        request.GET.get('page')
+    )
+    posts = Post.objects.select_related('author', 'group').only(
+        *POST_FIELDS, *AUTHOR_FIELDS, *GROUP_FIELDS
+    ).in_bulk(page_obj.object_list)
+    # Посты идут в порядке ранга, а удалённые после поиска пропускаются.
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    return render(
+        request, 'posts/search.html', {'page_obj': page_obj, 'query': query}
     )
 
 
@@ -97,9 +152,9 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    )
+    posts = get_timeline(request.user).select_related(
+        'author', 'group'
+    ).only(*POST_FIELDS, *AUTHOR_FIELDS, *GROUP_FIELDS)
     context = {
         'page_obj': get_page_content(posts, request)
     }
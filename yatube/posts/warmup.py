@@ -0,0 +1,137 @@
+"""Прогрев кешей популярных страниц после деплоя или сброса кеша.
+
+Первые страницы главной, ленты самых больших групп и профили авторов
+с наибольшим числом подписчиков запрашиваются анонимно через
+тестовый клиент Django - тем же путём, что и обычный запрос. Так
+заполняются фрагменты лент, число постов страниц и кеш страниц целиком.
+Миниатюры картинок с этих страниц создаются заранее: иначе в кеш
+попала бы заглушка.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from . import thumbnails
+from .models import Group, Post, UserStats
+from .utils import CursorPaginator
+
+logger = logging.getLogger(__name__)
+
+LOCK_KEY = 'warm_cache_lock'
+
+
+def index_pages(pages):
+    """Адреса первых pages страниц главной и посты на них.
+
+    Ссылки главной курсорные, поэтому курсоры вычисляются тем же
+    CursorPaginator, что и в представлении.
+    """
+    paginator = CursorPaginator(
+        Post.objects.only('pub_date', 'image'), settings.MAX_AMOUNT
+    )
+    url = reverse('posts:index')
+    cursor = None
+    for _ in range(pages):
+        page = paginator.get_page(cursor)
+        yield url + (f'?cursor={cursor}' if cursor else ''), page
+        cursor = page.next_cursor
+        if cursor is None:
+            return
+
+
+def collect(pages, groups, profiles):
+    """Адреса для прогрева и картинки постов на них."""
+    urls = []
+    images = set()
+    for url, page in index_pages(pages):
+        urls.append(url)
+        images.update(post.image.name for post in page)
+    top_groups = Group.objects.filter(posts_count__gt=0).order_by(
+        '-posts_count'
+    )[:groups]
+    for group in top_groups:
+        urls.append(reverse('posts:group_list', args=[group.slug]))
+        images.update(_first_page_images(group.posts.all()))
+    top_authors = UserStats.objects.filter(posts_count__gt=0).order_by(
+        '-followers_count'
+    ).select_related('user')[:profiles]
+    for stats in top_authors:
+        urls.append(reverse('posts:profile', args=[stats.user.username]))
+        images.update(_first_page_images(stats.user.posts.all()))
+    images.discard('')
+    return urls, sorted(images)
+
+
+def _first_page_images(posts):
+    return posts.values_list('image', flat=True)[:settings.MAX_AMOUNT]
+
+
+def fetch(url):
+    """Запрашивает страницу анонимно; возвращает (url, статус, секунды)."""
+    client = Client(HTTP_HOST=settings.WARM_CACHE_HOST)
+    started = time.perf_counter()
+    response = client.get(url)
+    return url, response.status_code, time.perf_counter() - started
+
+
+def _fetch_in_thread(url):
+    try:
+        return fetch(url)
+    finally:
+        # У каждого потока пула свои соединения с базой.
+        connections.close_all()
+
+
+def render(urls, workers=1):
+    """Запрашивает адреса, workers штук параллельно."""
+    if workers <= 1:
+        return [fetch(url) for url in urls]
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(_fetch_in_thread, urls))
+
+
+def warm(pages=None, groups=None, profiles=None, workers=None,
+         processes=1, log=None):
+    """Прогревает кеши; возвращает результаты fetch() по всем адресам."""
+    urls, images = collect(
+        settings.WARM_CACHE_PAGES if pages is None else pages,
+        settings.WARM_CACHE_GROUPS if groups is None else groups,
+        settings.WARM_CACHE_PROFILES if profiles is None else profiles,
+    )
+    if images:
+        thumbnails.enqueue(*images)
+        thumbnails.work(processes, once=True, log=log, names=images)
+    return render(urls, settings.WARM_CACHE_WORKERS if workers is None
+                  else workers)
+
+
+def warm_on_first_request(sender, **kwargs):
+    """Прогрев в фоне после первого запроса к процессу.
+
+    Из всех процессов, которые делят кеш, прогревает один: тот, кто
+    первым поставил блокировку.
+    """
+    request_started.disconnect(
+        warm_on_first_request, dispatch_uid='posts.warmup'
+    )
+    if not cache.add(LOCK_KEY, 1, settings.WARM_CACHE_LOCK_TIMEOUT):
+        return
+    threading.Thread(target=_warm_in_background, daemon=True).start()
+
+
+def _warm_in_background():
+    try:
+        results = warm()
+        logger.info('Прогрето страниц: %d', len(results))
+    except Exception:
+        logger.exception('Прогрев кеша не удался')
+    finally:
+        connections.close_all()
@@ -0,0 +1,22 @@
+// Кнопка "Показать ещё" под комментариями: подгружает следующую порцию
+// вместо перехода на страницу с ней.
+document.getElementById('comments').addEventListener('click', (event) => {
+  const link = event.target.closest('[data-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.fragment)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then((html) => {
+      link.parentElement.outerHTML = html;
+    })
+    .catch(() => {
+      window.location = link.href;
+    });
+});
@@ -11,6 +11,77 @@ import os
 
 MAX_AMOUNT = 10
 
+# Ленты, которые листаются курсором (?cursor=) вместо номера страницы.
+# Старые ссылки вида ?page=N продолжают работать через обычный Paginator.
+CURSOR_PAGINATION_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+)
+
+# Комментарии под постом показываются порциями: первая - на странице
+# поста, следующие подгружает кнопка "Показать ещё".
+COMMENTS_PER_PAGE = 20
+
+# Материализованная лента подписок (posts.timeline).
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 1000
+# Сколько последних постов автора попадает в ленту при подписке.
+TIMELINE_BACKFILL = 200
+TIMELINE_BATCH_SIZE = 500
+
+# Фрагменты лент сбрасываются сигналами, поэтому живут долго.
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Страницы, которые анонимы получают из кеша целиком
+# (posts.middleware.PageCacheMiddleware). Они сбрасываются сигналами,
+# а срок нужен, чтобы не отстал год в подвале. Поиска здесь нет: каждая
+# новая строка запроса заняла бы в кеше свою страницу.
+PAGE_CACHE_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+)
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Полнотекстовый поиск (posts.search): 'fts5', 'python' или 'auto' -
+# FTS5, если таблица posts_search создана миграцией. После смены
+# индекса его нужно собрать заново: manage.py rebuild_search_index.
+SEARCH_BACKEND = 'auto'
+# Сколько лучших результатов листается на странице поиска.
+SEARCH_MAX_RESULTS = 1000
+SEARCH_BATCH_SIZE = 500
+# Сколько самых новых документов со всеми словами запроса ранжирует
+# индекс SearchTerm: у частых слов их может быть почти весь сайт.
+SEARCH_MAX_CANDIDATES = 10000
+
+# Прогрев кеша (manage.py warm_cache).
+WARM_CACHE_PAGES = 3
+WARM_CACHE_GROUPS = 10
+WARM_CACHE_PROFILES = 10
+WARM_CACHE_WORKERS = 4
+# Хост из ALLOWED_HOSTS, с которым идут запросы прогрева.
+WARM_CACHE_HOST = 'localhost'
+# Прогревать ли кеш в фоне после первого запроса к серверу. Прогревает
+# один процесс из всех, а следующий прогрев возможен через
+# WARM_CACHE_LOCK_TIMEOUT секунд.
+WARM_CACHE_ON_STARTUP = os.environ.get('WARM_CACHE_ON_STARTUP') == '1'
+WARM_CACHE_LOCK_TIMEOUT = 10 * 60
+
+# Защита от лавины пересчётов (core.stampede).
+# Сколько секунд после срока годности отдаётся старое значение, пока
+# один запрос считает новое.
+CACHE_STALE_TIMEOUT = 60
+# Сколько живёт блокировка пересчёта и сколько её ждут без старого
+# значения.
+CACHE_LOCK_TIMEOUT = 10
+CACHE_WAIT_INTERVAL = 0.05
+# Насколько рано пересчитывать заранее: 0 - никогда, больше 1 - раньше.
+CACHE_EARLY_BETA = 1.0
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -49,13 +120,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'posts.middleware.PageCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -84,13 +159,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# core.db.sqlite3 - стоковый бэкенд с WAL, прагмами и очередью
+# писателей; прагмы можно переопределить в OPTIONS['pragmas'].
+# OPTIONS['pool'] - пул соединений процесса (core.db.pool): size
+# постоянных соединений, ещё max_overflow при нехватке, timeout секунд
+# ожидания свободного, max_lifetime секунд жизни соединения и проверка
+# SELECT 1 при выдаче (pre_ping).
+DATABASE_POOL = {
+    'size': 5,
+    'max_overflow': 10,
+    'timeout': 10,
+    'max_lifetime': 30 * 60,
+    'pre_ping': True,
+}
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {'pool': DATABASE_POOL},
     }
 }
 
+# Реплики только для чтения (core.db.router): пути к копиям базы через
+# запятую в DATABASE_REPLICAS. Репликацию обеспечивает не Django.
+DATABASE_REPLICAS = ()
+for number, path in enumerate(
+    filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'core.db.sqlite3',
+        'NAME': path,
+        'OPTIONS': {'pool': DATABASE_POOL},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS += (f'replica{number}',)
+DATABASE_ROUTERS = ['core.db.router.ReplicaRouter']
+# Страницы, которые читают с реплик.
+REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:search',
+)
+# Сколько секунд после записи пользователь читает с основной базы.
+# Должно быть не меньше REPLICA_MAX_LAG.
+REPLICA_PIN = 10
+REPLICA_PIN_COOKIE = 'primary'
+REPLICA_MAX_LAG = 5
+REPLICA_CHECK_INTERVAL = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -143,8 +262,117 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Бюджет SQL-запросов на страницу (core.middleware.QueryBudgetMiddleware).
+QUERY_BUDGET_DEFAULT = 20
+QUERY_BUDGETS = {
+    'posts:index': 8,
+    'posts:group_list': 8,
+    'posts:profile': 8,
+    'posts:post_detail': 8,
+    'posts:follow_index': 8,
+    # Запись: пост, счётчики групп, картинка, раскладка по лентам, индекс.
+    'posts:post_create': 20,
+    'posts:post_edit': 20,
+}
+# Сколько раз один и тот же SQL может повториться за запрос.
+QUERY_DUPLICATE_LIMIT = 3
+# True - превышение бюджета падает исключением; в тестах включено
+# (core.runner).
+QUERY_BUDGET_RAISE = bool(os.environ.get('QUERY_BUDGET_RAISE'))
+# Заголовок Server-Timing с временем и числом запросов к базе. Он
+# раскрывает устройство сайта, поэтому включается только для отладки.
+SERVER_TIMING = bool(os.environ.get('SERVER_TIMING'))
+
+# Метрики Prometheus (core.metrics), отдаются на /metrics тому, кто
+# передал заголовок "Authorization: Bearer <METRICS_TOKEN>". Без токена
+# /metrics закрыт.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+# Общий каталог для снимков метрик воркеров; None - только свой процесс.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 10
+
+# Проверка картинок при приёме (core.uploads): лимиты и допустимые форматы.
+FILE_UPLOAD_HANDLERS = [
+    'core.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+UPLOAD_IMAGE_FIELDS = ('image',)
+UPLOAD_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+UPLOAD_IMAGE_MAX_PIXELS = 40 * 10 ** 6
+UPLOAD_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Сколько байт начала файла ждать заголовок картинки.
+UPLOAD_IMAGE_HEADER_BYTES = 256 * 1024
+
+THUMBNAIL_ENGINE = 'core.thumbnail.Engine'
+THUMBNAIL_BACKEND = 'core.thumbnail.Backend'
+# Ключи миниатюр в общем для процессов файле SQLite (core.kvstore).
+# Файл лежит рядом с базой: MEDIA_ROOT раздаётся наружу.
+THUMBNAIL_KVSTORE = 'core.kvstore.KVStore'
+THUMBNAIL_KVSTORE_PATH = os.environ.get(
+    'THUMBNAIL_KVSTORE_PATH', os.path.join(BASE_DIR, 'thumbnails.sqlite3')
+)
+THUMBNAIL_KVSTORE_LRU_SIZE = 10000
+THUMBNAIL_KVSTORE_TIMEOUT = 5
+# Миниатюры картинок постов: пресет -> (геометрия, опции sorl-thumbnail).
+# Воркер (manage.py thumbnail_worker) создаёт их все заранее.
+THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Кроме полной ширины пресета - узкие варианты для srcset.
+THUMBNAIL_WIDTHS = (320, 640)
+THUMBNAIL_SIZES = '(min-width: 992px) 960px, 100vw'
+# Формат -> качество. Форматы, которые не умеет сохранять Pillow
+# (AVIF до Pillow 11.2 без плагина), пропускаются. Последний формат -
+# основной, его получают браузеры без поддержки остальных.
+THUMBNAIL_FORMATS = {
+    'AVIF': 60,
+    'WEBP': 80,
+    'JPEG': 85,
+}
+# Заглушка из static, пока миниатюра не готова.
+THUMBNAIL_PLACEHOLDER = 'img/placeholder.svg'
+THUMBNAIL_QUEUE_BATCH = 20
+THUMBNAIL_QUEUE_RETRIES = 3
+# Через сколько секунд задание упавшего воркера возвращается в очередь.
+THUMBNAIL_QUEUE_STALE = 10 * 60
+THUMBNAIL_QUEUE_POLL = 2
+
+# Кеш общий для всех воркеров: файл SQLite на хосте (core.cache) или
+# сервер Redis, если задан REDIS_URL. Перед ним стоит LRU процесса
+# (TieredCache).
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_LOCATION = os.environ.get(
+    'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+)
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'core.cache.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    }
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'L1_SIZE': 1000,
+            # Запись set() из другого процесса видна не позже чем
+            # через L1_TIMEOUT, а delete() и incr() - через POLL_INTERVAL.
+            'L1_TIMEOUT': 5,
+            'POLL_INTERVAL': 1,
+        },
+    },
+    'shared': SHARED_CACHE,
 }
+# manage.py test переносит общий кеш и ключи миниатюр во временные
+# файлы (core.runner).
+TEST_RUNNER = 'core.runner.TestRunner'